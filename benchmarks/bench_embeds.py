@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+# Compares how many error embeds per second each way of building them manages.
+# Run from the repository root with ``python -m benchmarks.bench_embeds``, or as part of ``python -m benchmarks``.
+
+import timeit
+import types
+
+from discord import Embed
+
+from src.classes.embed import EmbedTemplate, MoxieEmbed, merge_embeds
+
+from .harness import benchmark
+
+DETAILS = "error: member not found\n |\n | => foo is not a valid member\n |\n | => For more information use help hug"
+TEMPLATE = EmbedTemplate(title="moxie could not find what you were looking for :s", description="```sh\n{details}```")
+ctx = types.SimpleNamespace(author=types.SimpleNamespace(display_avatar=types.SimpleNamespace(url="https://cdn/a.png")))
+base = Embed(title="base", description="base").add_field(name="a", value="b").set_image(url="https://cdn/b.png")
+
+
+@benchmark()
+def factory() -> MoxieEmbed:
+    return MoxieEmbed.factory(
+        ctx, title="moxie could not find what you were looking for :s", description=f"```sh\n{DETAILS}```"  # type: ignore
+    )
+
+
+@benchmark()
+def template() -> MoxieEmbed:
+    return TEMPLATE.render(ctx, details=DETAILS)  # type: ignore
+
+
+@benchmark()
+def merge_round_trip() -> MoxieEmbed:
+    merged = base.to_dict()
+    merged.update(factory().to_dict())  # type: ignore
+    return MoxieEmbed.from_dict(merged)
+
+
+@benchmark()
+def merge_slots() -> MoxieEmbed:
+    return merge_embeds(base, factory(), MoxieEmbed)
+
+
+def main(number: int = 20_000) -> None:
+    for name, func in (
+        ("MoxieEmbed.factory", factory),
+        ("EmbedTemplate.render", template),
+        ("merge via to_dict/from_dict", merge_round_trip),
+        ("merge_embeds", merge_slots),
+    ):
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{name:<30} {number / best:>12,.0f} embeds/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+# Micro-benchmarks for the src.utils primitives on our hot paths.
+
+import asyncio
+import itertools
+
+from typing import Any, Coroutine
+
+from src.constants import Colours
+from src.utils import AsyncCache, InsensitiveMapping, LruCache, MaxSizeList, TimeToLiveCache
+from src.utils.async_utils import Key
+from src.utils.math import Calculator
+
+from .harness import benchmark
+
+
+def drive(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Runs a coroutine that never suspends, such as a cache hit, without an event loop."""
+    try:
+        coro.send(None)
+    except StopIteration as exc:
+        return exc.value
+    raise RuntimeError("coroutine suspended")
+
+
+lru = LruCache(1024)
+for i in range(1024):
+    lru[i] = i
+keys = itertools.cycle(range(1024))
+misses = itertools.count(1024)
+
+
+@benchmark()
+def lru_cache_hit() -> None:
+    lru[next(keys)]
+
+
+@benchmark()
+def lru_cache_insert_evict() -> None:
+    lru[next(misses)] = None
+
+
+ttl = TimeToLiveCache._TimeToLive(60, 1024)
+for i in range(1024):
+    ttl[i] = i
+
+
+@benchmark()
+def time_to_live_cache_hit() -> None:
+    key = next(keys)
+    if key in ttl:
+        ttl[key]
+
+
+async def fetch(user_id: int, guild: str = "moxie") -> int:
+    await asyncio.sleep(0)
+    return user_id
+
+
+cached_fetch = AsyncCache(1024)(fetch)
+ttl_fetch = TimeToLiveCache(60, 1024)(fetch)
+for i in range(1024):
+    asyncio.run(cached_fetch(i, guild="moxie"))
+    asyncio.run(ttl_fetch(i))
+
+
+@benchmark()
+def async_cache_hit() -> None:
+    drive(cached_fetch(next(keys), guild="moxie"))
+
+
+@benchmark()
+def time_to_live_cache_decorator_hit() -> None:
+    drive(ttl_fetch(next(keys)))
+
+
+class Member:
+    def __init__(self, user_id: int) -> None:
+        self.id = user_id
+        self.name = f"user{user_id}"
+
+
+member = Member(1)
+
+
+@benchmark()
+def key_hash() -> None:
+    hash(Key((1, "moxie", (2, 3)), {"guild": "moxie"}))
+
+
+@benchmark()
+def key_hash_object() -> None:
+    hash(Key((member,), {}))
+
+
+mapping = InsensitiveMapping()
+mapping.update({f"Command{i}": i for i in range(256)})
+
+
+@benchmark()
+def insensitive_mapping_get() -> None:
+    mapping["COMMAND128"]
+
+
+@benchmark()
+def insensitive_mapping_contains_miss() -> None:
+    "missing" in mapping
+
+
+@benchmark()
+def insensitive_mapping_set() -> None:
+    mapping["Extra"] = 1
+
+
+history = MaxSizeList(256)
+
+
+@benchmark()
+def max_size_list_push() -> None:
+    history.push(1)
+
+
+@benchmark()
+def calculator_cached() -> None:
+    Calculator("(1 + 2) * 3 ^ 2 / 4 - 7").calculate()
+
+
+@benchmark()
+def calculator_variables() -> None:
+    Calculator("x ^ 2 + 3 * x - y").calculate(x=2.5, y=1)
+
+
+expressions = (f"({i} + 2) * 3 ^ 2 / 4 - 7" for i in itertools.count())
+
+
+@benchmark()
+def calculator_compile() -> None:
+    Calculator.compile(next(expressions))
+
+
+@benchmark()
+def constants_attribute() -> None:
+    Colours.EMBED
+
+
+@benchmark()
+def constants_getitem() -> None:
+    Colours["EMBED"]
+
+
+@benchmark()
+def constants_contains() -> None:
+    "EMBED" in Colours
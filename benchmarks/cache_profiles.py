@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+# Compares the memory the member and presence caches take under each cache profile.
+#
+#     python -m benchmarks.cache_profiles                    # 100k members, 30% online
+#     python -m benchmarks.cache_profiles --members 250000 --online 0.5
+#
+# Every profile runs in a fresh interpreter, which parses synthetic GUILD_CREATE
+# payloads through the same parsers the bot installs, and reports the growth of
+# its resident set size scaled to 100k members.
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import json
+import asyncio
+import argparse
+import subprocess
+
+from typing import Any, Dict, List, Optional, Sequence
+
+__all__ = ("measure", "main")
+
+GUILD_SIZE = 25_000
+
+
+def _rss() -> int:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        # Peak rather than current, which is good enough for memory that is only ever added.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _guild(guild_id: int, first: int, count: int, online: float) -> Dict[str, Any]:
+    members: List[Dict[str, Any]] = []
+    presences: List[Dict[str, Any]] = []
+    for user_id in range(first, first + count):
+        user = {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None, "global_name": None}
+        members.append(
+            {"user": user, "roles": [], "joined_at": "2022-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+        )
+        if (user_id % 1000) < online * 1000:
+            presences.append(
+                {
+                    "user": {"id": str(user_id)},
+                    "status": "online",
+                    "client_status": {"desktop": "online", "mobile": "idle"},
+                    "activities": [
+                        {"name": "Custom Status", "type": 4, "state": "busy", "emoji": {"name": "fish"}},
+                        {"name": "A game", "type": 0, "timestamps": {"start": 1700000000000}, "application_id": "1"},
+                    ],
+                }
+            )
+
+    return {
+        "id": str(guild_id),
+        "name": f"guild{guild_id}",
+        "member_count": count,
+        "members": members,
+        "presences": presences,
+        "large": True,
+        "owner_id": str(first),
+        "roles": [],
+        "channels": [],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "premium_tier": 0,
+    }
+
+
+async def _child(profile_name: str, members: int, online: float) -> Dict[str, Any]:
+    import discord
+
+    from src.classes.presence import CacheProfile, install_status_tracking
+    from src.utils import StatusStore
+
+    profile = CacheProfile(profile_name)
+    intents = discord.Intents(guilds=True, members=True, presences=True)
+    client = discord.Client(
+        intents=intents, chunk_guilds_at_startup=False, member_cache_flags=profile.member_cache_flags(intents)
+    )
+    await client._async_setup_hook()
+    statuses = StatusStore()
+    install_status_tracking(client, statuses, profile)
+
+    gc.collect()
+    before = _rss()
+    for guild_id, first in enumerate(range(0, members, GUILD_SIZE), start=1):
+        payload = _guild(guild_id, first + 1, min(GUILD_SIZE, members - first), online)
+        client._connection.parsers["GUILD_CREATE"](payload)
+        del payload
+        gc.collect()
+
+    grown = _rss() - before
+    cached = sum(len(guild.members) for guild in client.guilds)
+    await client.close()
+    return {
+        "profile": profile.value,
+        "members": cached,
+        "online": len(statuses),
+        "rss": grown,
+        "rss_per_100k": grown * 100_000 / max(cached, 1),
+        "status_store": statuses.nbytes,
+    }
+
+
+def measure(profile: str, *, members: int = 100_000, online: float = 0.3) -> Dict[str, Any]:
+    """Runs one profile in a fresh interpreter and returns what it measured."""
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.cache_profiles",
+            "--child",
+            profile,
+            "--members",
+            str(members),
+            "--online",
+            str(online),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        raise RuntimeError(f"Measuring the {profile} profile failed:\n{process.stderr}")
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.cache_profiles", description="Compares cache profiles.")
+    parser.add_argument("--members", type=int, default=100_000)
+    parser.add_argument("--online", type=float, default=0.3, help="share of members with a presence")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.child, args.members, args.online))))
+        return 0
+
+    from src.classes.presence import CacheProfile
+
+    results = [measure(profile.value, members=args.members, online=args.online) for profile in CacheProfile]
+    print(f"{'profile':<8} {'members':>9} {'online':>8} {'RSS MiB':>9} {'MiB/100k':>9} {'statuses KiB':>13}")
+    for result in results:
+        print(
+            f"{result['profile']:<8} {result['members']:>9,} {result['online']:>8,} {result['rss'] / 2**20:>9.1f} "
+            f"{result['rss_per_100k'] / 2**20:>9.1f} {result['status_store'] / 2**10:>13.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
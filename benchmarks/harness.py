@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import sys
+import json
+import time
+import timeit
+import pathlib
+import platform
+import argparse
+import datetime
+import importlib
+import statistics
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+__all__ = ("Result", "benchmark", "run", "compare", "main")
+
+ROOT = pathlib.Path(__file__).parent
+BASELINE = ROOT / "baseline.json"
+RESULTS = ROOT / "results"
+
+REGISTRY: Dict[str, Callable[[], Any]] = {}
+
+
+class Result(NamedTuple):
+    """Timings of one benchmark, in nanoseconds per call."""
+
+    name: str
+    number: int
+    best: float
+    median: float
+    stdev: float
+
+
+def benchmark(name: Optional[str] = None) -> Callable[[Callable[[], Any]], Callable[[], Any]]:
+    """Registers a zero-argument callable as a benchmark, named ``<module>.<function>`` by default.
+
+    Examples
+    --------
+    >>> @benchmark()
+    ... def lru_hit() -> None:
+    ...     cache[1]
+    """
+
+    def decorator(func: Callable[[], Any]) -> Callable[[], Any]:
+        module = func.__module__.rpartition(".")[2].removeprefix("bench_")
+        REGISTRY[name or f"{module}.{func.__name__}"] = func
+        return func
+
+    return decorator
+
+
+def discover() -> None:
+    for path in sorted(ROOT.glob("bench_*.py")):
+        try:
+            importlib.import_module(f"{__package__}.{path.stem}")
+        except Exception as exc:
+            # e.g. modules importing src.classes need the bot's settings in the environment.
+            print(f"Skipping {path.stem}: {type(exc).__name__}: {str(exc).splitlines()[0]}", file=sys.stderr)
+
+
+def run(pattern: str = "", *, repeat: int = 7, min_time: float = 0.2) -> List[Result]:
+    """Runs every registered benchmark whose name contains ``pattern``.
+
+    Each benchmark is calibrated to take at least ``min_time`` seconds per round,
+    then timed for ``repeat`` rounds. The best round is the figure compared
+    against the baseline, as it is the least disturbed by the rest of the machine.
+    """
+    results: List[Result] = []
+    for name, func in sorted(REGISTRY.items()):
+        if pattern not in name:
+            continue
+
+        timer = timeit.Timer(func)
+        number, elapsed = timer.autorange()
+        number = max(int(number * min_time / max(elapsed, 1e-9)), 1)
+        rounds = [elapsed / number * 1e9 for elapsed in timer.repeat(repeat, number)]
+        results.append(Result(name, number, min(rounds), statistics.median(rounds), statistics.stdev(rounds)))
+        print(f"{name:<45} {results[-1].best:>12,.1f} ns/op  (median {results[-1].median:,.1f})")
+    return results
+
+
+def save(results: Sequence[Result], path: pathlib.Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "created_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "results": {result.name: result._asdict() for result in results},
+    }
+    path.write_text(json.dumps(document, indent=2))
+
+
+def load(path: pathlib.Path) -> Dict[str, Result]:
+    document = json.loads(path.read_text())
+    return {name: Result(**result) for name, result in document["results"].items()}
+
+
+def compare(
+    results: Sequence[Result], baseline: Dict[str, Result], *, threshold: float = 0.25
+) -> List[Tuple[str, float, float, float]]:
+    """Returns ``(name, baseline, current, ratio)`` for every benchmark more than ``threshold`` slower."""
+    regressions = []
+    for result in results:
+        if (previous := baseline.get(result.name)) is None:
+            continue
+
+        ratio = result.best / previous.best
+        marker = "REGRESSED" if ratio > 1 + threshold else "improved" if ratio < 1 - threshold else ""
+        print(f"{result.name:<45} {previous.best:>12,.1f} -> {result.best:>12,.1f} ns/op  x{ratio:.2f} {marker}")
+        if ratio > 1 + threshold:
+            regressions.append((result.name, previous.best, result.best, ratio))
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Runs the benchmarks and compares them against the baseline, returning the exit code.
+
+    Timings only compare on the same machine and interpreter, so no baseline is
+    committed. Produce one from a clean checkout of the reference revision:
+
+        git checkout main && python -m benchmarks --save-baseline
+        git checkout - && python -m benchmarks --require-baseline
+
+    The second run exits with 1 when a benchmark is more than ``--threshold``
+    slower, or, with ``--require-baseline``, when there is no baseline at all.
+
+    Examples
+    --------
+    >>> python -m benchmarks utils --save-baseline
+    ... python -m benchmarks utils --require-baseline --threshold 0.1
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Runs the micro-benchmarks offline.",
+        epilog="The baseline is per machine and not committed; create it with --save-baseline on the reference revision.",
+    )
+    parser.add_argument("pattern", nargs="?", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--output", type=pathlib.Path, help="where to write the results (default: results/<time>.json)")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--require-baseline", action="store_true", help="fail instead of skipping without a baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    discover()
+    results = run(args.pattern, repeat=args.repeat, min_time=args.min_time)
+
+    output = args.output or RESULTS / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    save(results, output)
+    print(f"\nWrote {len(results)} results to {output}")
+
+    if args.save_baseline:
+        save(results, args.baseline)
+        print(f"Stored them as the baseline in {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.", file=sys.stderr)
+        return 1 if args.require_baseline else 0
+
+    print(f"\nCompared to {args.baseline}:")
+    regressions = compare(results, load(args.baseline), threshold=args.threshold)
+    for name, previous, current, ratio in regressions:
+        print(f"{name} regressed: {previous:,.1f} -> {current:,.1f} ns/op (x{ratio:.2f})", file=sys.stderr)
+    return 1 if regressions else 0
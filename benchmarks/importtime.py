@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+# Reports what importing the bot costs, from ``python -X importtime``.
+#
+#     python -m benchmarks.importtime                  # src.classes.bot, median of 5 runs
+#     python -m benchmarks.importtime src.utils --top 30
+#     python -m benchmarks.importtime --budget 400     # exit 1 when slower than 400ms
+#
+# Every run is a fresh interpreter, so nothing is served from ``sys.modules``;
+# ``.pyc`` files are warm after the first run.
+from __future__ import annotations
+
+import sys
+import json
+import pathlib
+import argparse
+import statistics
+import subprocess
+
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+__all__ = ("Import", "measure", "main")
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+class Import(NamedTuple):
+    """One line of ``-X importtime`` output, in microseconds."""
+
+    name: str
+    depth: int
+    own: int
+    cumulative: int
+
+
+def _parse(output: str) -> List[Import]:
+    imports: List[Import] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        imports.append(Import(name.strip(), depth, int(own), int(cumulative)))
+    return imports
+
+
+def measure(module: str, *, runs: int = 5) -> List[Import]:
+    """Imports ``module`` in ``runs`` fresh interpreters and keeps the median timings of every import."""
+    samples: Dict[str, List[Import]] = {}
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise RuntimeError(f"Importing {module} failed:\n{process.stderr}")
+        for entry in _parse(process.stderr):
+            samples.setdefault(entry.name, []).append(entry)
+
+    return [
+        Import(
+            name,
+            entries[0].depth,
+            int(statistics.median(entry.own for entry in entries)),
+            int(statistics.median(entry.cumulative for entry in entries)),
+        )
+        for name, entries in samples.items()
+    ]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.importtime", description="Reports import time.")
+    parser.add_argument("module", nargs="?", default="src.classes.bot")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="how many of the slowest imports to list")
+    parser.add_argument("--budget", type=float, help="fail when the import takes longer, in milliseconds")
+    parser.add_argument("--output", type=pathlib.Path, help="also write every import as JSON")
+    args = parser.parse_args(argv)
+
+    imports = measure(args.module, runs=args.runs)
+    total = next(entry.cumulative for entry in imports if entry.name == args.module) / 1000
+
+    print(f"import {args.module}: {total:,.1f} ms over {len(imports)} modules (median of {args.runs})\n")
+    print(f"{'self ms':>9} {'total ms':>9}  module")
+    for entry in sorted(imports, key=lambda entry: entry.own, reverse=True)[: args.top]:
+        print(f"{entry.own / 1000:>9.1f} {entry.cumulative / 1000:>9.1f}  {entry.name}")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(
+            json.dumps({"module": args.module, "imports": [entry._asdict() for entry in imports]}, indent=2)
+        )
+
+    if args.budget is not None and total > args.budget:
+        print(f"\n{args.module} took {total:,.1f} ms, over the {args.budget:,.1f} ms budget.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
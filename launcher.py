@@ -19,6 +19,11 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+import time
+
+# Taken before anything else is imported, so the startup log covers import time too.
+started = time.perf_counter()
+
 import asyncio
 
 from src.utils import suppress
@@ -26,4 +31,4 @@ from src.classes.bot import starter
 
 if __name__ == "__main__":
     with suppress(asyncio.CancelledError, KeyboardInterrupt, log="whatever {wotnot}", wotnot="I don't know"):
-        asyncio.run(starter())
+        asyncio.run(starter(started=started))
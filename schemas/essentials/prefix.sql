@@ -44,3 +44,17 @@ DROP TRIGGER IF EXISTS insert_default_prefix_trigger ON guild;
 CREATE TRIGGER insert_default_prefix_trigger
 AFTER INSERT ON guild
 FOR EACH ROW EXECUTE PROCEDURE insert_default_prefix();
+
+ALTER TABLE prefix ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS prefix_updated_at_idx ON prefix (updated_at);
+
+DROP TRIGGER IF EXISTS prefix_touch_updated_at_trigger ON prefix;
+CREATE TRIGGER prefix_touch_updated_at_trigger
+BEFORE UPDATE ON prefix
+FOR EACH ROW EXECUTE PROCEDURE touch_updated_at();
+
+-- Prefixes are cached per guild, so a deleted prefix is recorded by its guild.
+DROP TRIGGER IF EXISTS prefix_record_deletion_trigger ON prefix;
+CREATE TRIGGER prefix_record_deletion_trigger
+AFTER DELETE ON prefix
+FOR EACH ROW EXECUTE PROCEDURE record_cache_deletion('guild_id');
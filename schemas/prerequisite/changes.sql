@@ -0,0 +1,51 @@
+--
+-- The MIT License (MIT)
+-- Copyright (c) 2022-Present Lia Marie
+-- Permission is hereby granted, free of charge, to any person obtaining a
+-- copy of this software and associated documentation files (the "Software"),
+-- to deal in the Software without restriction, including without limitation
+-- the rights to use, copy, modify, merge, publish, distribute, sublicense,
+-- and/or sell copies of the Software, and to permit persons to whom the
+-- Software is furnished to do so, subject to the following conditions:
+-- The above copyright notice and this permission notice shall be included in
+-- all copies or substantial portions of the Software.
+-- THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+-- OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+-- FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+-- AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+-- LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+-- FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+-- DEALINGS IN THE SOFTWARE.
+--
+-- Lets a restarted bot refresh a cache snapshot with only what changed since it was taken:
+-- cached tables carry an updated_at column, and deleted rows are recorded here. Both are stamped
+-- with the start of the writing transaction, so the bot syncs from the oldest open transaction.
+CREATE TABLE IF NOT EXISTS cache_deletions
+(
+    table_name text NOT NULL,
+    key bigint NOT NULL,
+    deleted_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS cache_deletions_deleted_at_idx ON cache_deletions (deleted_at);
+
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS
+$BODY$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$BODY$
+LANGUAGE plpgsql;
+
+-- TG_ARGV[0] names the column whose value identifies the deleted row in the cache.
+CREATE OR REPLACE FUNCTION record_cache_deletion()
+RETURNS TRIGGER AS
+$BODY$
+BEGIN
+    INSERT INTO cache_deletions (table_name, key) VALUES (TG_TABLE_NAME, (to_jsonb(OLD) ->> TG_ARGV[0])::bigint);
+    RETURN OLD;
+END;
+$BODY$
+LANGUAGE plpgsql;
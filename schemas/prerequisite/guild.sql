@@ -27,3 +27,16 @@ CREATE TABLE IF NOT EXISTS guild
 );
 
 CREATE INDEX IF NOT EXISTS guild_guild_id_idx ON guild (guild_id);
+
+ALTER TABLE guild ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS guild_updated_at_idx ON guild (updated_at);
+
+DROP TRIGGER IF EXISTS guild_touch_updated_at_trigger ON guild;
+CREATE TRIGGER guild_touch_updated_at_trigger
+BEFORE UPDATE ON guild
+FOR EACH ROW EXECUTE PROCEDURE touch_updated_at();
+
+DROP TRIGGER IF EXISTS guild_record_deletion_trigger ON guild;
+CREATE TRIGGER guild_record_deletion_trigger
+AFTER DELETE ON guild
+FOR EACH ROW EXECUTE PROCEDURE record_cache_deletion('guild_id');
@@ -27,3 +27,16 @@ CREATE TABLE IF NOT EXISTS users
 );
 
 CREATE INDEX IF NOT EXISTS user_user_id_idx ON users (user_id);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS users_updated_at_idx ON users (updated_at);
+
+DROP TRIGGER IF EXISTS users_touch_updated_at_trigger ON users;
+CREATE TRIGGER users_touch_updated_at_trigger
+BEFORE UPDATE ON users
+FOR EACH ROW EXECUTE PROCEDURE touch_updated_at();
+
+DROP TRIGGER IF EXISTS users_record_deletion_trigger ON users;
+CREATE TRIGGER users_record_deletion_trigger
+AFTER DELETE ON users
+FOR EACH ROW EXECUTE PROCEDURE record_cache_deletion('user_id');
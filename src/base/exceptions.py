@@ -19,3 +19,59 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+__all__ = (
+    "MoxieException",
+    "PoolSaturated",
+    "RequestFailed",
+    "InvalidExpression",
+    "ExpressionTooExpensive",
+    "InvalidSnapshot",
+)
+
+
+class MoxieException(Exception):
+    """Base exception for errors raised by moxie itself."""
+
+
+class PoolSaturated(MoxieException):
+    """Raised when an executor pool's queue is full and its policy is to reject."""
+
+    def __init__(self, pool: str) -> None:
+        self.pool = pool
+        super().__init__(f"Executor pool <{pool}> is saturated.")
+
+
+class RequestFailed(MoxieException):
+    """Raised when a request made through the web client returns an error status."""
+
+    def __init__(self, url: str, status: int) -> None:
+        self.url = url
+        self.status = status
+        super().__init__(f"Request to <{url}> failed with status {status}.")
+
+
+class InvalidExpression(MoxieException):
+    """Raised when an expression given to the calculator cannot be compiled."""
+
+    def __init__(self, expression: str, reason: str) -> None:
+        self.expression = expression
+        self.reason = reason
+        super().__init__(f"Invalid expression <{expression}>: {reason}.")
+
+
+class ExpressionTooExpensive(MoxieException):
+    """Raised when an expression is estimated or measured to be too costly to evaluate."""
+
+    def __init__(self, expression: str, reason: str) -> None:
+        self.expression = expression
+        self.reason = reason
+        super().__init__(f"Expression <{expression}> is too expensive: {reason}.")
+
+
+class InvalidSnapshot(MoxieException):
+    """Raised when a cache snapshot is truncated, corrupted or written by another version."""
+
+    def __init__(self, path: str, reason: str) -> None:
+        self.path = path
+        self.reason = reason
+        super().__init__(f"Invalid snapshot <{path}>: {reason}.")
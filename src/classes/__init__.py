@@ -20,6 +20,13 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 from .database import *
+from .resolver import *
+from .http import *
+from .twemoji import *
+from .snapshot import *
+from .extensions import *
+from .chunking import *
+from .presence import *
 from .context import *
 from .embed import *
 from .bot import *
@@ -22,8 +22,8 @@ DEALINGS IN THE SOFTWARE.
 from __future__ import annotations
 
 import io
-import os
 import re
+import time
 
 import pathlib
 import logging
@@ -35,7 +35,7 @@ import collections
 
 from redis.asyncio import Redis
 from asyncio import ensure_future
-from typing import Optional, Self, Union, Dict, List
+from typing import Any, Callable, Coroutine, Optional, Self, Union, Dict, List
 
 import aiohttp
 import asyncpg
@@ -43,19 +43,47 @@ import discord
 from discord.ext import commands, tasks
 from discord import Message, Interaction
 
+from src.base import InvalidSnapshot
 from src.models import Guild, User
+from src.views import ConfirmationManager
 from src.config import Settings, Logger
-from src.utils import PartialCall, InsensitiveMapping, make_async
-
-from . import DatabaseConnector, Context
-
-settings: Settings = Settings()  # type: ignore
-formatter = Logger.get_formatter()
-discord.utils.setup_logging(handler=logging.StreamHandler(), level=logging.INFO, formatter=formatter, root=True)
+from src.utils import (
+    PartialCall,
+    InsensitiveMapping,
+    MemberIndex,
+    LoopProfiler,
+    CommandMetrics,
+    StageClock,
+    MessageScheduler,
+    StatusStore,
+    instrumented,
+    make_async,
+    shutdown_pools,
+)
+
+from . import (
+    DatabaseConnector,
+    Context,
+    Resolver,
+    WebClient,
+    EmojiAtlas,
+    ExtensionLoader,
+    CacheSnapshot,
+    ChunkPolicy,
+    GuildChunker,
+    CacheProfile,
+    install_status_tracking,
+)
+
+DispatchHook = Callable[[Context], Coroutine[Any, Any, Optional[bool]]]
+# Deletions are only logged this long, so an older snapshot is reloaded from scratch instead.
+SNAPSHOT_RETENTION = datetime.timedelta(days=7)
+# Covers transactions of other roles, whose start pg_stat_activity does not show.
+SYNC_MARGIN = datetime.timedelta(seconds=30)
 
 
 class RoboMoxie(commands.Bot):
-    def __init__(self) -> None:
+    def __init__(self, settings: Settings, *, started: Optional[float] = None) -> None:
         intents: discord.Intents = discord.Intents(
             guilds=True,
             members=True,
@@ -66,9 +94,18 @@ class RoboMoxie(commands.Bot):
             reactions=True,
             message_content=True,
         )
+        self.cache_profile: CacheProfile = CacheProfile(settings.CACHE_PROFILE)
+        # Members are requested after connecting, by the chunker, instead of before the bot becomes ready.
         super().__init__(
-            self.get_prefix, intents=intents, case_insensitive=True, owner_ids=list(map(int, settings.OWNER_IDS.split(" ")))
+            self.get_prefix,
+            intents=intents,
+            case_insensitive=True,
+            chunk_guilds_at_startup=False,
+            member_cache_flags=self.cache_profile.member_cache_flags(intents),
+            owner_ids=list(map(int, settings.OWNER_IDS.split(" "))),
         )
+        self.statuses: StatusStore = StatusStore()
+        install_status_tracking(self, self.statuses, self.cache_profile)
         self.call: PartialCall = PartialCall()
         self.settings: Settings = settings
 
@@ -77,12 +114,24 @@ class RoboMoxie(commands.Bot):
 
         self.uptime: datetime.datetime = datetime.datetime.now(tz=datetime.timezone.utc)
         self.logger: logging.Logger = logging.getLogger(__name__)
+        # ``time.perf_counter()`` at process start, cleared once the gateway connect time is logged.
+        self.started: Optional[float] = started
 
         # Variables which are set in the process of initializing the bot.
+        self.web: WebClient = WebClient()
         self.session: Optional[aiohttp.ClientSession] = None
+        self.twemoji: EmojiAtlas = EmojiAtlas(self)
         self.pool: Optional[asyncpg.Pool] = None
         self.db: Optional[DatabaseConnector] = None
         self.redis: Redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+        self.resolver: Resolver = Resolver(self)
+        self.member_index: MemberIndex = MemberIndex()
+        self.profiler: LoopProfiler = LoopProfiler()
+        self.metrics: CommandMetrics = CommandMetrics()
+        self.outbox: MessageScheduler = MessageScheduler()
+        self.confirmations: ConfirmationManager = ConfirmationManager(self, redis=self.redis)
+        self.before_invoke(self.after_conversion)
+        self.after_invoke(self.after_callback)
 
         # Cache
         self.cached_users: Dict[int, User] = {}
@@ -90,9 +139,20 @@ class RoboMoxie(commands.Bot):
         self.cached_images: Dict[str, io.BytesIO] = {}
         self.cached_prefixes: Dict[int, List[str]] = {}
         self.cached_context: collections.deque[commands.Context["RoboMoxie"]] = collections.deque(maxlen=10)
+        self.snapshot_path: pathlib.Path = pathlib.Path("cache/snapshot.bin")
 
         # Private variables
         self._is_day: bool = True
+        # Database time at which the cached rows were last read, as a UNIX timestamp.
+        self._cache_synced_at: Optional[float] = None
+        self._pre_dispatch: List[DispatchHook] = []
+        self._post_dispatch: List[DispatchHook] = []
+
+        # These register dispatch hooks, so they come after the hook lists.
+        self.extension_loader: ExtensionLoader = ExtensionLoader(self)
+        self.chunker: GuildChunker = GuildChunker(
+            self, policy=ChunkPolicy(settings.CHUNK_POLICY), max_concurrency=settings.CHUNK_CONCURRENCY
+        )
 
     @tasks.loop(minutes=1)
     async def update_time(self) -> None:
@@ -113,11 +173,7 @@ class RoboMoxie(commands.Bot):
         return await super().get_context(origin, cls=Context or cls)
 
     async def get_or_fetch_channel(self, channel_id: int, /) -> Optional[discord.abc.MessageableChannel]:
-        channel = self.get_channel(channel_id)
-        if channel is None:
-            channel = await self.fetch_channel(channel_id)
-
-        return channel
+        return await self.resolver.channel(channel_id)  # type: ignore
 
     async def fill_user_cache(self) -> None:
         records = await self.db.fetch("SELECT * FROM users", simple=False)
@@ -138,11 +194,95 @@ class RoboMoxie(commands.Bot):
             self.cached_guilds[guild.guild_id] = guild
 
     async def fill_prefix_cache(self) -> None:
-        records = await self.db.fetch("SELECT * FROM prefix", simple=False)
-        self.cached_prefixes = {
-            record["guild_id"]: [record["prefix"] for record in records if record["guild_id"] == record["guild_id"]]
-            for record in records
+        records = await self.db.fetch("SELECT guild_id, prefix FROM prefix", simple=False)
+        self.cached_prefixes = self.group_prefixes(records)
+
+    @staticmethod
+    def group_prefixes(records: List[Any]) -> Dict[int, List[str]]:
+        prefixes: Dict[int, List[str]] = collections.defaultdict(list)
+        for guild_id, prefix in records:
+            prefixes[guild_id].append(prefix)
+        return dict(prefixes)
+
+    async def sync_point(self) -> float:
+        """Returns the database time a later delta has to start from to see every change not visible yet.
+
+        Rows are stamped with ``now()``, which is when the writing transaction
+        started, not when it committed. A transaction still open now can commit
+        rows stamped earlier, so the sync point is the start of the oldest open
+        transaction rather than the current time.
+        """
+        record = await self.db.fetch(
+            "SELECT least(now() - $1::interval, min(xact_start)) AS since FROM pg_stat_activity "
+            "WHERE datname = current_database() AND xact_start IS NOT NULL",
+            SYNC_MARGIN,
+        )
+        return record["since"].timestamp()
+
+    def restore_snapshot(self, snapshot: CacheSnapshot) -> None:
+        self.cached_users = {
+            user_id: User({"user_id": user_id, "emoji_server_id": emoji_server_id}, self)
+            for user_id, emoji_server_id in snapshot.users
         }
+        self.cached_guilds = {
+            guild_id: Guild({"guild_id": guild_id, "score_counting": score_counting, "score_prefix": score_prefix}, self)
+            for guild_id, score_counting, score_prefix in snapshot.guilds
+        }
+        self.cached_prefixes = self.group_prefixes(snapshot.prefixes)
+        self._cache_synced_at = snapshot.synced_at
+
+    async def apply_cache_changes(self, since: float) -> int:
+        """Refetches the users, guilds and prefixes changed or deleted since ``since``, returning how many."""
+        synced_at = await self.sync_point()
+        since_at = datetime.datetime.fromtimestamp(since, tz=datetime.timezone.utc)
+
+        deletions = await self.db.fetch(
+            "SELECT table_name, key FROM cache_deletions WHERE deleted_at >= $1", since_at, simple=False
+        )
+        users = await self.db.fetch("SELECT * FROM users WHERE updated_at >= $1", since_at, simple=False)
+        guilds = await self.db.fetch("SELECT * FROM guild WHERE updated_at >= $1", since_at, simple=False)
+        prefixes = await self.db.fetch("SELECT DISTINCT guild_id FROM prefix WHERE updated_at >= $1", since_at, simple=False)
+
+        # Deletions go first: a row deleted and then inserted again comes back with the updates.
+        changed_prefixes = {record["guild_id"] for record in prefixes}
+        for table_name, key in deletions:
+            if table_name == "users":
+                self.cached_users.pop(key, None)
+            elif table_name == "guild":
+                self.cached_guilds.pop(key, None)
+            elif table_name == "prefix":
+                changed_prefixes.add(key)
+
+        for record in users:
+            self.cached_users[record["user_id"]] = User(record, self)
+        for record in guilds:
+            self.cached_guilds[record["guild_id"]] = Guild(record, self)
+
+        if changed_prefixes:
+            records = await self.db.fetch(
+                "SELECT guild_id, prefix FROM prefix WHERE guild_id = ANY($1::bigint[])",
+                list(changed_prefixes),
+                simple=False,
+            )
+            for guild_id in changed_prefixes:
+                self.cached_prefixes.pop(guild_id, None)
+            self.cached_prefixes.update(self.group_prefixes(records))
+
+        self._cache_synced_at = synced_at
+        return len(deletions) + len(users) + len(guilds) + len(changed_prefixes)
+
+    async def save_snapshot(self) -> None:
+        if self._cache_synced_at is None:
+            return
+
+        snapshot = CacheSnapshot(
+            self._cache_synced_at,
+            [(user.user_id, user.emoji_server_id) for user in self.cached_users.values()],
+            [(guild.guild_id, guild.score_counting, guild.score_prefix) for guild in self.cached_guilds.values()],
+            [(guild_id, prefix) for guild_id, prefixes in self.cached_prefixes.items() for prefix in prefixes],
+        )
+        size = await make_async(snapshot.dump)(self.snapshot_path)
+        self.logger.info("Saved a %s byte cache snapshot to %s.", size, self.snapshot_path)
 
     async def get_prefix(self, message: discord.Message, /) -> Union[str, List[str]]:
         if not message.guild:
@@ -156,33 +296,103 @@ class RoboMoxie(commands.Bot):
 
         return commands.when_mentioned(self, message)
 
+    def pre_dispatch(self, coro: DispatchHook, /) -> DispatchHook:
+        """Registers a coroutine that runs on every parsed message before it is invoked.
+
+        Returning ``False`` from a hook stops the message from being dispatched.
+        """
+        self._pre_dispatch.append(coro)
+        return coro
+
+    def post_dispatch(self, coro: DispatchHook, /) -> DispatchHook:
+        """Registers a coroutine that runs on every message after it was invoked."""
+        self._post_dispatch.append(coro)
+        return coro
+
     async def process_commands(self, message: discord.Message, /) -> None:
+        if message.author.bot:
+            return
+
+        # The prefix and command are parsed once here and the same context is invoked,
+        # instead of letting the base implementation build a second one.
+        clock = StageClock()
+        try:
+            ctx = await self.get_context(message)
+            clock.lap("parse")
+
+            for hook in self._pre_dispatch:
+                if await hook(ctx) is False:
+                    return
+            clock.lap("pre_dispatch")
+
+            if ctx.valid and getattr(ctx.cog, 'qualified_name', None) != 'Myself':
+                self.cached_context.append(ctx)
+                await ctx.typing()
+
+            await self.invoke(ctx)
+            clock.lap("invoke")
+
+            for hook in self._post_dispatch:
+                await hook(ctx)
+            clock.lap("post_dispatch")
+        finally:
+            self.metrics.record_dispatch(clock)
+
+    async def _run_event(
+        self, coro: Callable[..., Coroutine[Any, Any, Any]], event_name: str, /, *args: Any, **kwargs: Any
+    ) -> None:
+        owner = getattr(coro, "__self__", None)
+        cog = owner.qualified_name if isinstance(owner, commands.Cog) else None
+        measured = self.profiler.wrap(coro, name=getattr(coro, "__qualname__", event_name), kind="listener", cog=cog)
+        return await super()._run_event(measured, event_name, *args, **kwargs)
+
+    async def invoke(self, ctx: commands.Context[Self], /) -> None:
+        if ctx.command is None:
+            return await super().invoke(ctx)
+
+        name, cog = ctx.command.qualified_name, ctx.cog.qualified_name if ctx.cog else None
+        ctx.clock = StageClock()
+        try:
+            return await self.profiler.measure(super().invoke(ctx), name=name, kind="command", cog=cog)
+        finally:
+            self.metrics.record(name, ctx.clock, failed=ctx.command_failed)
 
-        ctx = await self.get_context(message)
-        if ctx.valid and getattr(ctx.cog, 'qualified_name', None) != 'Myself':
-            self.cached_context.append(ctx)
-            await ctx.typing()
+    def add_command(self, command: commands.Command[Any, ..., Any], /) -> None:
+        # Subcommands are instrumented along with their group, so a group's checks are timed as checks too.
+        for registered in (command, *getattr(command, "walk_commands", tuple)()):
+            instrumented(registered)
+        super().add_command(command)
 
-        return await super().process_commands(message)
+    async def after_conversion(self, ctx: commands.Context[Self], /) -> None:
+        if (clock := getattr(ctx, "clock", None)) is not None:
+            clock.lap("conversion")
+
+    async def after_callback(self, ctx: commands.Context[Self], /) -> None:
+        if (clock := getattr(ctx, "clock", None)) is not None:
+            clock.lap("callback")
 
     async def setup_hook(self) -> None:
+        self.profiler.start()
+        self.chunker.start()
         try:
             self.db: DatabaseConnector = DatabaseConnector(self)
             self.db.pool = await asyncpg.create_pool(
-                user=settings.POSTGRES_USER,
-                password=settings.POSTGRES_PASSWORD,
-                database=settings.POSTGRES_DB,
-                host=settings.HOST,
-                port=settings.PORT,
+                user=self.settings.POSTGRES_USER,
+                password=self.settings.POSTGRES_PASSWORD,
+                database=self.settings.POSTGRES_DB,
+                host=self.settings.HOST,
+                port=self.settings.PORT,
             )
-            self.session: aiohttp.ClientSession = aiohttp.ClientSession()
+            self.session: aiohttp.ClientSession = await self.web.start()
+            await self.twemoji.open()
 
             self.call.append(
                 [
-                    ensure_future(self.after_database_setup()),
                     ensure_future(self.setup_extensions()),
-                    ensure_future(self.setup_cache()),
+                    ensure_future(self.setup_database()),
                     ensure_future(self.update_time.start()),
+                    ensure_future(self.resolver.warm(self.settings.TRANSCRIPT_CHANNEL)),
+                    ensure_future(self.confirmations.start()),
                 ]
             )
 
@@ -191,15 +401,54 @@ class RoboMoxie(commands.Bot):
         else:
             self.logger.info("Successfully set up the bot.")
 
+    async def setup_database(self) -> None:
+        # The schemas add the columns that restoring a cache snapshot relies on, so they go first.
+        await self.after_database_setup()
+        await self.setup_cache()
+
     async def setup_cache(self) -> None:
+        """Restores the caches from the snapshot left by the last shutdown, or loads them from the database.
+
+        A restored snapshot is brought up to date with only the rows changed or
+        deleted since it was taken, instead of reading every table again.
+        """
+        started = time.perf_counter()
+        await self.db.execute("DELETE FROM cache_deletions WHERE deleted_at < now() - $1::interval", SNAPSHOT_RETENTION)
+
+        try:
+            snapshot: Optional[CacheSnapshot] = await make_async(CacheSnapshot.load)(self.snapshot_path)
+        except FileNotFoundError:
+            snapshot = None
+        except InvalidSnapshot as exc:
+            self.logger.warning("Ignoring the cache snapshot: %s", exc)
+            snapshot = None
+
+        if snapshot is not None and time.time() - snapshot.synced_at < SNAPSHOT_RETENTION.total_seconds():
+            try:
+                self.restore_snapshot(snapshot)
+                changes = await self.apply_cache_changes(snapshot.synced_at)
+            except asyncpg.PostgresError as exc:
+                self.logger.exception("Failed to bring the cache snapshot up to date.", exc_info=exc)
+            else:
+                self.logger.info(
+                    "Restored the caches from a snapshot with %s changes in %.1fms.",
+                    changes,
+                    (time.perf_counter() - started) * 1000,
+                )
+                return
+
+        self.cached_users.clear()
+        self.cached_guilds.clear()
+        self._cache_synced_at = await self.sync_point()
         await self.fill_user_cache()
         await self.fill_guild_cache()
         await self.fill_prefix_cache()
+        self.logger.info("Loaded the caches from the database in %.1fms.", (time.perf_counter() - started) * 1000)
 
     async def after_database_setup(self) -> None:
         prerequisite = pathlib.Path(__file__).parent.parent.parent / 'schemas' / 'prerequisite'
         essentials = pathlib.Path(__file__).parent.parent.parent / 'schemas' / 'essentials'
-        directories = itertools.chain(prerequisite.glob('*.sql'), essentials.glob('*.sql'))
+        directories = itertools.chain(sorted(prerequisite.glob('*.sql')), sorted(essentials.glob('*.sql')))
 
         for file in directories:
             try:
@@ -208,36 +457,50 @@ class RoboMoxie(commands.Bot):
                 self.logger.exception("Failed to execute %s", file.name, exc_info=exc)
 
     async def setup_extensions(self) -> None:
-        exclude = '_', '.'
-        extensions = [file for file in os.listdir('src/extensions') if not file.startswith(exclude)]
+        await self.extension_loader.load_all()
 
-        self.logger.info("Loading extensions...")
-        for extension in extensions:
-            name = extension[:-3] if extension.endswith('.py') else extension
-            try:
-                await self.load_extension(f'src.extensions.{name}')
-                self.logger.info(f"[{name.upper()}] Loaded successfully.")
-
-            except Exception as exc:
-                self.logger.exception(msg=f"[{name.upper()}] Failed to load.", exc_info=exc)
+    async def on_connect(self) -> None:
+        if self.started is not None:
+            self.logger.info("Connected to the gateway %.2fs after process start.", time.perf_counter() - self.started)
+            self.started = None
 
     async def on_ready(self) -> None:
         self.logger.info(f"Logged in as {self.user} (ID: {self.user.id})")
 
     async def close(self) -> None:
-        if hasattr(self, 'session'):
-            await self.session.close()
+        self.profiler.stop()
+        self.outbox.close()
+        self.confirmations.stop()
+        self.chunker.stop()
+
+        await self.web.close()
+        await self.twemoji.close()
+
+        try:
+            await self.save_snapshot()
+        except Exception as exc:
+            self.logger.exception("Failed to save the cache snapshot.", exc_info=exc)
 
         if hasattr(self, 'db'):
             await self.db.pool.close()
 
+        shutdown_pools()
+
         return await super().close()
 
 
-moxie = RoboMoxie()
-moxie._BotBase__cogs = InsensitiveMapping()
+async def starter(*, started: Optional[float] = None) -> None:
+    """Configures logging, then builds and runs the bot.
 
+    Nothing happens when this module is imported, so tools and benchmarks can
+    import the bot without reading settings or touching the root logger.
+    ``started`` is ``time.perf_counter()`` at process start, for the startup log.
+    """
+    settings: Settings = Settings()  # type: ignore
+    formatter = Logger.get_formatter()
+    discord.utils.setup_logging(handler=logging.StreamHandler(), level=logging.INFO, formatter=formatter, root=True)
 
-async def starter() -> None:
+    moxie = RoboMoxie(settings, started=started)
+    moxie._BotBase__cogs = InsensitiveMapping()
     async with moxie:
         await moxie.start(settings.TOKEN)
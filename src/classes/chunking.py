@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import enum
+import time
+import heapq
+import asyncio
+import logging
+
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import discord
+
+if TYPE_CHECKING:
+    from . import RoboMoxie, Context
+
+__all__ = ("ChunkPolicy", "ChunkPriority", "ChunkProgress", "GuildChunker")
+logger = logging.getLogger(__name__)
+
+
+class ChunkPolicy(enum.Enum):
+    """When the members of a guild are requested from the gateway.
+
+    ``EAGER`` guilds are chunked in the background once they become available,
+    ``LAZY`` guilds the first time a command is used in them, and ``ON_DEMAND``
+    guilds only when something explicitly awaits :meth:`GuildChunker.chunk`.
+
+    discord.py drops presence and user updates for members that are not cached,
+    so name, avatar and status history is only recorded in chunked guilds. Only
+    ``EAGER`` covers every guild, shortly after the bot becomes ready.
+    """
+
+    EAGER = "eager"
+    LAZY = "lazy"
+    ON_DEMAND = "on_demand"
+
+
+class ChunkPriority(enum.IntEnum):
+    """Lower values are chunked first."""
+
+    DEMANDED = 0
+    ACTIVE = 1
+    BACKGROUND = 2
+
+
+class ChunkProgress(NamedTuple):
+    available: int
+    chunked: int
+    queued: int
+    in_flight: int
+    members: int
+
+
+class GuildChunker:
+    """Chunks guilds according to a :class:`ChunkPolicy`, a few at a time, most wanted first.
+
+    The bot connects with ``chunk_guilds_at_startup`` disabled, so it can answer
+    commands straight away, and this requests members afterwards instead. At most
+    ``max_concurrency`` chunk requests are in flight. Guilds someone is waiting on
+    go first, then guilds where commands are being used, then eager background
+    work, smaller guilds first within each tier. Guilds with fewer than
+    ``eager_below`` members are cheap, so they are chunked eagerly whatever the
+    default policy.
+
+    Examples
+    --------
+    >>> bot.chunker.set_policy(guild.id, ChunkPolicy.EAGER)
+    ... members = await bot.chunker.chunk(guild)
+    ... bot.chunker.progress()
+    ChunkProgress(available=120, chunked=37, queued=2, in_flight=2, members=91002)
+    """
+
+    def __init__(
+        self,
+        bot: RoboMoxie,
+        *,
+        policy: ChunkPolicy = ChunkPolicy.EAGER,
+        max_concurrency: int = 2,
+        eager_below: int = 1000,
+    ) -> None:
+        self.bot = bot
+        self.policy = policy
+        self.max_concurrency = max_concurrency
+        self.eager_below = eager_below
+        self.overrides: Dict[int, ChunkPolicy] = {}
+
+        self._available: Set[int] = set()
+        # Member count of every chunked guild.
+        self._chunked: Dict[int, int] = {}
+        self._in_flight: Set[int] = set()
+        # (priority, member count, guild id); entries whose priority was since improved are skipped.
+        self._heap: List[Tuple[int, int, int]] = []
+        self._queued: Dict[int, int] = {}
+        self._waiters: Dict[int, asyncio.Future[None]] = {}
+        self._wakeup: asyncio.Event = asyncio.Event()
+        self._workers: List[asyncio.Task[None]] = []
+        self._busy_since: Optional[float] = None
+        bot.pre_dispatch(self._on_dispatch)
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    @property
+    def chunked_members(self) -> int:
+        return sum(self._chunked.values())
+
+    def start(self) -> None:
+        self.bot.add_listener(self.on_guild_available)
+        self.bot.add_listener(self.on_guild_available, "on_guild_join")
+        self.bot.add_listener(self.on_guild_remove)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.max_concurrency)]
+
+    def stop(self) -> None:
+        self.bot.remove_listener(self.on_guild_available)
+        self.bot.remove_listener(self.on_guild_available, "on_guild_join")
+        self.bot.remove_listener(self.on_guild_remove)
+        for worker in self._workers:
+            worker.cancel()
+        self._workers.clear()
+        for future in self._waiters.values():
+            future.cancel()
+        self._waiters.clear()
+
+    def set_policy(self, guild_id: int, policy: Optional[ChunkPolicy]) -> None:
+        """Overrides the policy of one guild, or restores the default with ``None``."""
+        if policy is None:
+            self.overrides.pop(guild_id, None)
+        else:
+            self.overrides[guild_id] = policy
+
+    def policy_for(self, guild: discord.Guild) -> ChunkPolicy:
+        if (policy := self.overrides.get(guild.id)) is not None:
+            return policy
+        if (guild.member_count or 0) < self.eager_below:
+            return ChunkPolicy.EAGER
+        return self.policy
+
+    def progress(self) -> ChunkProgress:
+        return ChunkProgress(
+            len(self._available), len(self._chunked), len(self._queued), len(self._in_flight), self.chunked_members
+        )
+
+    def schedule(self, guild: discord.Guild, priority: ChunkPriority = ChunkPriority.BACKGROUND) -> None:
+        """Queues a guild for chunking, or moves it up the queue when ``priority`` is more urgent."""
+        if guild.chunked or guild.id in self._in_flight:
+            return
+
+        current = self._queued.get(guild.id)
+        if current is None or priority < current:
+            self._queued[guild.id] = priority
+            heapq.heappush(self._heap, (priority, guild.member_count or 0, guild.id))
+            if self._busy_since is None:
+                self._busy_since = time.perf_counter()
+            self._wakeup.set()
+
+    async def chunk(self, guild: discord.Guild) -> List[discord.Member]:
+        """Returns every member of ``guild``, chunking it ahead of everything else first if needed."""
+        if not guild.chunked:
+            future = self._waiters.get(guild.id)
+            if future is None:
+                future = self._waiters[guild.id] = asyncio.get_running_loop().create_future()
+            self.schedule(guild, ChunkPriority.DEMANDED)
+            await asyncio.shield(future)
+        return guild.members
+
+    async def on_guild_available(self, guild: discord.Guild) -> None:
+        self._available.add(guild.id)
+        if guild.chunked:
+            self._chunked[guild.id] = len(guild.members)
+        elif self.policy_for(guild) is ChunkPolicy.EAGER:
+            self.schedule(guild)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        self._available.discard(guild.id)
+        self._chunked.pop(guild.id, None)
+        self._queued.pop(guild.id, None)
+        self._resolve(guild.id)
+
+    async def _on_dispatch(self, ctx: Context) -> None:
+        if ctx.guild is not None and ctx.command is not None and self.policy_for(ctx.guild) is not ChunkPolicy.ON_DEMAND:
+            self.schedule(ctx.guild, ChunkPriority.ACTIVE)
+
+    def _pop(self) -> Optional[int]:
+        while self._heap:
+            priority, _, guild_id = heapq.heappop(self._heap)
+            if self._queued.get(guild_id) == priority:
+                del self._queued[guild_id]
+                return guild_id
+        return None
+
+    async def _work(self) -> None:
+        while True:
+            if (guild_id := self._pop()) is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            guild = self.bot.get_guild(guild_id)
+            if guild is None or guild.chunked:
+                self._resolve(guild_id)
+                continue
+
+            self._in_flight.add(guild_id)
+            started = time.perf_counter()
+            try:
+                members = await guild.chunk(cache=True)
+            except Exception as exc:
+                logger.warning("Failed to chunk guild %s.", guild_id, exc_info=exc)
+                self._resolve(guild_id, exc)
+            else:
+                self._chunked[guild_id] = len(members)
+                # The index was built from a partial member cache, so it is rebuilt on the next search.
+                self.bot.member_index.drop(guild_id)
+                logger.debug(
+                    "Chunked %s members of guild %s in %.2fs.", len(members), guild_id, time.perf_counter() - started
+                )
+                self._resolve(guild_id)
+            finally:
+                self._in_flight.discard(guild_id)
+
+            if not self._queued and not self._in_flight and self._busy_since is not None:
+                progress = self.progress()
+                logger.info(
+                    "Chunked %s of %s guilds (%s members) after %.2fs.",
+                    progress.chunked,
+                    progress.available,
+                    progress.members,
+                    time.perf_counter() - self._busy_since,
+                )
+                self._busy_since = None
+
+    def _resolve(self, guild_id: int, exc: Optional[BaseException] = None) -> None:
+        future = self._waiters.pop(guild_id, None)
+        if future is None or future.done():
+            return
+        if exc is None:
+            future.set_result(None)
+        else:
+            future.set_exception(exc)
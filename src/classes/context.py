@@ -21,8 +21,6 @@ DEALINGS IN THE SOFTWARE.
 """
 from __future__ import annotations
 
-import asyncio
-import aiohttp
 import logging
 
 from typing import (
@@ -38,34 +36,37 @@ from typing import (
 import functools
 import contextlib
 
-import PIL
 import discord
 
-from PIL import Image
 from io import BytesIO
-from bs4 import BeautifulSoup
 
 from discord.ext import commands
-from twemoji_parser import emoji_to_url
 
 if TYPE_CHECKING:
-    from . import RoboMoxie, MoxieEmbed
+    import aiohttp
 
-from src.utils import make_async
-from src.views import ConfirmView
+    from . import RoboMoxie, WebClient
+
+from .embed import MoxieEmbed, merge_embeds
+
+from src.utils import ImageHandle, Priority, ShellResult, StageClock, make_async, shell_runner, sniff_image
+from src.views import DEFAULT_BUTTONS, Buttons
 
 logger = logging.getLogger(__name__)
-embed_only_kwargs = [
-    "color",
-    "colour",
-    "title",
-    "type",
-    "description",
-    "url",
-    "timestamp",
-    "fields",
-    "field_inline",
-]
+MAX_IMAGE_PIXELS: int = 89_478_485  # Pillow's own decompression bomb threshold
+embed_only_kwargs = frozenset(
+    {
+        "color",
+        "colour",
+        "title",
+        "type",
+        "description",
+        "url",
+        "timestamp",
+        "fields",
+        "field_inline",
+    }
+)
 
 
 class Context(commands.Context["RoboMoxie"]):
@@ -76,6 +77,7 @@ class Context(commands.Context["RoboMoxie"]):
 
     message: discord.Message
     channel: discord.abc.Messageable
+    clock: Optional[StageClock] = None
 
     @property
     def reference(self) -> discord.Message | Literal[False]:
@@ -91,18 +93,57 @@ class Context(commands.Context["RoboMoxie"]):
     def session(self) -> aiohttp.ClientSession | None:
         return self.bot.session
 
+    @property
+    def web(self) -> WebClient:
+        return self.bot.web
+
+    async def emoji_buffer(self, emoji: str, /) -> Optional[BytesIO]:
+        """Returns the twemoji PNG of ``emoji`` from the local atlas, or ``None`` if there is none."""
+        return await self.bot.twemoji.buffer(emoji)
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> discord.Message:
+        send = functools.partial(super().send, content, **kwargs)
+        if self.interaction is None:
+            # Interaction responses have their own deadline and bucket; everything else is paced per channel.
+            send = functools.partial(self.bot.outbox.schedule, self.channel.id, send, priority=Priority.INTERACTIVE)
+
+        if self.clock is None:
+            return await send()
+
+        with self.clock.stage("send"):
+            return await send()
+
     @staticmethod
-    async def to_shell_wrapper(command: str) -> Tuple[str, str]:
-        process = await asyncio.create_subprocess_shell(
-            command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await process.communicate()
-        return stdout.decode(), stderr.decode()
+    async def to_shell_wrapper(command: str, *, timeout: Optional[float] = None) -> Tuple[str, str]:
+        result = await shell_runner.run(command, timeout=timeout)
+        return result.stdout, result.stderr
+
+    async def shell(self, command: str, *, timeout: Optional[float] = None) -> ShellResult:
+        """Runs ``command`` and streams its output into a message that is edited as it grows."""
+        message: Optional[discord.Message] = None
+
+        async def on_output(output: str) -> None:
+            nonlocal message
+            content = "```sh\n{}\n```".format(output[-1900:].replace("```", "`\u200b``") or " ")
+            if message is None:
+                message = await self.send(content)
+            else:
+                edit = functools.partial(message.edit, content=content)
+                await self.bot.outbox.schedule(self.channel.id, edit, coalesce=("edit", message.id))
+
+        result = await shell_runner.run(command, timeout=timeout, on_output=on_output)
+        if result.timed_out or result.truncated:
+            notes = ("timed out" if result.timed_out else None, "output truncated" if result.truncated else None)
+            await self.send(f"Command {', '.join(filter(None, notes))} (exit code {result.returncode}).")
+        return result
 
     @staticmethod
-    def check_buffer(buffer: BytesIO) -> Optional[BytesIO]:
+    def check_buffer(buffer: BytesIO) -> ImageHandle:
+        """Validates an image buffer from its header and returns a handle to it.
+
+        Only the magic bytes and dimensions are read, so this never blocks the
+        event loop on a full decode; use :meth:`ImageHandle.decode` for the image.
+        """
         if (size := buffer.tell()) < 1:
             message: str = f"Received empty buffer (%s bytes)."
             logger.warning(message, size)
@@ -112,34 +153,43 @@ class Context(commands.Context["RoboMoxie"]):
             logger.warning(message, size)
             raise commands.errors.BadArgument(message % size)
 
-        try:
-            Image.open(buffer)
-        except PIL.UnidentifiedImageError:
+        buffer.seek(0)
+        with buffer.getbuffer() as view:
+            info = sniff_image(view)
+
+        if info is None:
             message: str = f"Received buffer with unsupported image type."
             logger.warning(message)
             raise commands.errors.BadArgument(message)
-        finally:
-            buffer.seek(0)
+        elif info.pixels > MAX_IMAGE_PIXELS:
+            message: str = f"Received image too large (%sx%s pixels)."
+            logger.warning(message, info.width, info.height)
+            raise commands.errors.BadArgument(message % (info.width, info.height))
 
-        return buffer
+        return ImageHandle(buffer, info)
 
     async def maybe_reply(
         self, content: Optional[str], mention_author: bool = False, **kwargs: Any
     ) -> discord.Message | None:
-        await asyncio.sleep(0.05)
         with contextlib.suppress(discord.HTTPException):
             if self.message.reference:
-                return await self.message.reference.resolved.reply(  # type: ignore
+                reply = functools.partial(
+                    self.message.reference.resolved.reply,  # type: ignore
                     content=content,
                     mention_author=mention_author,
                     **kwargs,
                 )
+                return await self.bot.outbox.schedule(self.channel.id, reply, priority=Priority.INTERACTIVE)
             else:
                 return await self.send(content=content, **kwargs)
 
     @staticmethod
-    async def wrap(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
-        return await make_async(func)(*args, **kwargs)
+    async def wrap(func: Callable[..., Any], *args: Any, pool: str = "io", **kwargs: Any) -> Any:
+        """Runs a blocking function off the event loop, in the named executor pool.
+
+        Use ``pool="cpu"`` for CPU-heavy image and math work; see :func:`make_async`.
+        """
+        return await make_async(func, pool=pool)(*args, **kwargs)
 
     async def embed(
         self,
@@ -149,29 +199,23 @@ class Context(commands.Context["RoboMoxie"]):
         embed: Optional[discord.Embed] = None,
         **kwargs: Any,
     ) -> discord.Message | None:
-        original_embed = MoxieEmbed.factory(self, **{k: v for k, v in kwargs.items() if k in embed_only_kwargs})
+        original_embed = MoxieEmbed.factory(self, **{k: kwargs.pop(k) for k in embed_only_kwargs & kwargs.keys()})
 
         if embed:
-            new_embed = embed.to_dict()
-            new_embed.update(original_embed.to_dict())  # type: ignore
-            original_embed = MoxieEmbed.from_dict(new_embed)
+            original_embed = merge_embeds(embed, original_embed, MoxieEmbed)
 
-        to_send = (self.send, self.maybe_reply)
+        to_send = self.maybe_reply if self.message.reference else self.send
         if self.guild is not None and not self.channel.permissions_for(self.me).embed_links:  # type: ignore
             message: str = "Embed links permission not found in %s (%s)."
             logger.warning(message, self.channel, self.guild)
             raise commands.BotMissingPermissions(["embed_links"])
 
-        send_dict = {x: y for x, y in kwargs.items() if x not in embed_only_kwargs}
-        return await to_send(content=content, mention_author=mention_author, embed=original_embed, **send_dict)  # type: ignore
+        return await to_send(content=content, mention_author=mention_author, embed=original_embed, **kwargs)  # type: ignore
 
     async def confirm(
         self,
         message: str,
-        buttons: Tuple[
-            Tuple[str | None, str | None, discord.ButtonStyle],
-            Tuple[str | None, str | None, discord.ButtonStyle],
-        ],
+        buttons: Optional[Buttons] = None,
         delete_after_confirm: bool = True,
         delete_after_cancel: bool = True,
         delete_after_timeout: bool = True,
@@ -182,41 +226,36 @@ class Context(commands.Context["RoboMoxie"]):
 
         delete_after_cancel = delete_after_cancel if delete_after_cancel is not None else delete_after_confirm
 
-        view = ConfirmView(
-            ctx=self,
-            buttons=(buttons or (("✅", "Yes please!", discord.ButtonStyle.green), ("🗑️", "Nuuu!", discord.ButtonStyle.red))),
-            timeout=timeout,
-            owner=owner,
+        confirmation, view = self.bot.confirmations.create(
+            owner or self.author, timeout=timeout, buttons=buttons or DEFAULT_BUTTONS
         )
-
         message = await self.send(message, view=view)
-        await view.wait()
+        value = await self.bot.confirmations.wait(confirmation, message)
 
         if False in (delete_after_confirm, delete_after_cancel, delete_after_timeout):
-            view._children = [view.children[0]]
+            view.remove_item(view.children[1])
             for child in view.children:
                 child.disabled = True
-                if view.value is False:
+                if value is False:
                     child.label = "Cancelled"
-                    child.emoji = ("🗑️",)
+                    child.emoji = "🗑️"
                     child.style = discord.ButtonStyle.red
-                elif view.value is True:
+                elif value is True:
                     child.label = "Confirmed"
-                    child.emoji = ("✅",)
+                    child.emoji = "✅"
                     child.style = discord.ButtonStyle.green
                 else:
                     child.label = "Timed out"
-                    child.emoji = ("⏰",)
+                    child.emoji = "⏰"
                     child.style = discord.ButtonStyle.grey
-        view.stop()
-        if view.value is None:
+        if value is None:
             try:
                 if return_message is False:
                     (await message.edit(view=view)) if delete_after_timeout is False else (await message.delete())
             except (discord.Forbidden, discord.HTTPException):
                 pass
             return (None, message) if delete_after_timeout is False and return_message is True else None
-        elif view.value:
+        elif value:
             try:
                 if return_message is False:
                     (await message.edit(view=view)) if delete_after_confirm is False else (await message.delete())
@@ -25,8 +25,10 @@ from typing import (
     TYPE_CHECKING,
     Optional,
     Iterable,
+    TypeVar,
     Union,
     Tuple,
+    Type,
     Any,
 )
 
@@ -38,6 +40,54 @@ if TYPE_CHECKING:
 
 from src.constants import Colours
 
+__all__ = ("MoxieEmbed", "EmbedTemplate", "clone_embed", "merge_embeds")
+
+E = TypeVar("E", bound=Embed)
+
+EMBED_SLOTS: Tuple[str, ...] = Embed.__slots__
+NESTED_SLOTS = frozenset({"_footer", "_image", "_thumbnail", "_video", "_provider", "_author"})
+MISSING: Any = object()
+
+
+def clone_embed(embed: Embed, cls: Type[E] = Embed, /) -> E:  # type: ignore
+    """Copies ``embed`` attribute by attribute, as an instance of ``cls``.
+
+    Unlike :meth:`discord.Embed.copy`, this does not round-trip through
+    ``to_dict()``/``from_dict()``; only the nested dicts and the field list are copied.
+    """
+    instance = cls.__new__(cls)
+    for slot in EMBED_SLOTS:
+        if (value := getattr(embed, slot, MISSING)) is MISSING:
+            continue
+        if slot in NESTED_SLOTS:
+            value = dict(value)
+        elif slot == "_fields":
+            value = [dict(field) for field in value]
+        setattr(instance, slot, value)
+
+    if hasattr(embed, "__dict__"):
+        instance.__dict__.update(embed.__dict__)
+    return instance
+
+
+def merge_embeds(base: Embed, overlay: Embed, cls: Type[E] = Embed, /) -> E:  # type: ignore
+    """Returns a copy of ``base`` with every attribute set on ``overlay`` applied on top.
+
+    This is what ``base.to_dict()`` updated with ``overlay.to_dict()`` would give, without the round trip.
+    """
+    instance = clone_embed(base, cls)
+    for slot in EMBED_SLOTS:
+        if (value := getattr(overlay, slot, MISSING)) is MISSING:
+            continue
+        if slot[0] != "_" and value is None:
+            continue
+        if slot in NESTED_SLOTS:
+            value = dict(value)
+        elif slot == "_fields":
+            value = [dict(field) for field in value]
+        setattr(instance, slot, value)
+    return instance
+
 
 class MoxieEmbed(Embed):
     """A subclass of :class:`discord.Embed` with additional functionality."""
@@ -59,9 +109,16 @@ class MoxieEmbed(Embed):
     @classmethod
     def factory(cls, ctx: "Context", **kwargs: Any) -> "MoxieEmbed":
         """Base factory method for creating an embed."""
-        instance = cls(timestamp=utils.utcnow(), **kwargs)
-        instance.set_footer(text=f"Invoked by {ctx.author}", icon_url=ctx.author.display_avatar.url)
-        return instance
+        return cls(**kwargs).invoked_by(ctx)
+
+    def invoked_by(self, ctx: "Context") -> "MoxieEmbed":
+        """Stamps the embed with the current time and the invoking user, as :meth:`factory` does."""
+        self.timestamp = utils.utcnow()
+        self.set_footer(text=f"Invoked by {ctx.author}", icon_url=ctx.author.display_avatar.url)
+        return self
+
+    def copy(self) -> "MoxieEmbed":
+        return clone_embed(self, type(self))
 
     @classmethod
     def action(cls, title: str, gif: str, footer: str, **kwargs: Any) -> "MoxieEmbed":
@@ -70,3 +127,51 @@ class MoxieEmbed(Embed):
         instance.set_image(url=gif)
         instance.set_footer(text=footer)
         return instance
+
+
+class EmbedTemplate:
+    """An embed that is built once and cloned for every use.
+
+    ``title`` and ``description`` may contain :meth:`str.format` placeholders,
+    which are filled from the keyword arguments of :meth:`render` (literal braces
+    must be doubled). Rendering only copies the prebuilt embed, so module-level
+    templates are much cheaper than building a :class:`MoxieEmbed` per message.
+
+    Examples
+    --------
+    >>> NOT_FOUND = EmbedTemplate(title="moxie could not find that :s", description="{name} does not exist")
+    ... await ctx.send(embed=NOT_FOUND.render(ctx, name="foo"))
+    """
+
+    __slots__ = ("embed", "placeholders", "shared", "copied")
+
+    def __init__(self, **kwargs: Any) -> None:
+        self.embed: MoxieEmbed = MoxieEmbed(**kwargs)
+        self.placeholders: Tuple[str, ...] = tuple(
+            attribute for attribute in ("title", "description") if "{" in (getattr(self.embed, attribute) or "")
+        )
+
+        # Snapshot of the attributes that are set, so rendering never has to probe the unset ones.
+        state = [(slot, getattr(self.embed, slot)) for slot in EMBED_SLOTS if hasattr(self.embed, slot)]
+        self.shared: Tuple[Tuple[str, Any], ...] = tuple(
+            (slot, value) for slot, value in state if slot not in NESTED_SLOTS and slot != "_fields"
+        )
+        self.copied: Tuple[Tuple[str, Any], ...] = tuple(
+            (slot, value) for slot, value in state if slot in NESTED_SLOTS or slot == "_fields"
+        )
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} title={self.embed.title!r} placeholders={self.placeholders}>"
+
+    def render(self, ctx: Optional["Context"] = None, /, **values: Any) -> MoxieEmbed:
+        """Returns a fresh copy of the template, formatted with ``values`` and stamped for ``ctx`` if given."""
+        instance = MoxieEmbed.__new__(MoxieEmbed)
+        for slot, value in self.shared:
+            setattr(instance, slot, value)
+        for slot, value in self.copied:
+            setattr(instance, slot, [dict(field) for field in value] if slot == "_fields" else dict(value))
+
+        for attribute in self.placeholders:
+            setattr(instance, attribute, getattr(instance, attribute).format_map(values))
+
+        return instance.invoked_by(ctx) if ctx is not None else instance
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import ast
+import time
+import asyncio
+import logging
+import pathlib
+import graphlib
+
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from . import RoboMoxie, Context
+
+__all__ = ("ExtensionSpec", "ExtensionLoader")
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = pathlib.Path(__file__).parent.parent / "extensions"
+
+
+class ExtensionSpec(NamedTuple):
+    """What an extension declares about itself, read from its source without importing it.
+
+    ``requires`` holds the extensions that must be loaded first. An extension that
+    lists ``commands`` is lazy: it is only loaded when one of them is first used.
+    """
+
+    name: str
+    path: pathlib.Path
+    requires: FrozenSet[str]
+    commands: Tuple[str, ...]
+
+    @property
+    def lazy(self) -> bool:
+        return bool(self.commands)
+
+
+def _declarations(path: pathlib.Path) -> Dict[str, Any]:
+    # Only literal module-level assignments are read, so discovering an extension never runs it.
+    declarations: Dict[str, Any] = {}
+    for node in ast.parse(path.read_bytes(), filename=str(path)).body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            if (name := node.targets[0].id) in ("__requires__", "__commands__"):
+                declarations[name] = ast.literal_eval(node.value)
+    return declarations
+
+
+class ExtensionLoader:
+    """Loads the extensions under ``src/extensions`` concurrently, in dependency order.
+
+    An extension declares its dependencies with a module-level ``__requires__``
+    tuple of extension names, and can opt into lazy loading with ``__commands__``,
+    the names of the commands it provides. Independent extensions load at the same
+    time, so one slow ``setup()`` only delays the extensions that depend on it.
+    Load times are kept in :attr:`timings`.
+
+    Examples
+    --------
+    >>> # src/extensions/fun/__init__.py
+    ... __requires__ = ("events",)
+    ... __commands__ = ("graph", "calculate")
+    ...
+    ... await bot.extension_loader.load_all()
+    ... bot.extension_loader.timings
+    {'src.extensions.events': 0.0123}
+    """
+
+    def __init__(self, bot: RoboMoxie, *, directory: pathlib.Path = EXTENSIONS, package: str = "src.extensions") -> None:
+        self.bot = bot
+        self.directory = directory
+        self.package = package
+
+        self.specs: Dict[str, ExtensionSpec] = {}
+        self.timings: Dict[str, float] = {}
+        self.failed: Set[str] = set()
+
+        self._commands: Dict[str, str] = {}
+        self._pending: Dict[str, asyncio.Future[bool]] = {}
+        bot.pre_dispatch(self._load_on_demand)
+
+    def qualify(self, name: str) -> str:
+        return name if name.startswith(f"{self.package}.") else f"{self.package}.{name}"
+
+    def discover(self) -> Dict[str, ExtensionSpec]:
+        """Finds every extension module and package, and drops any that depend on each other in a cycle."""
+        self.specs.clear()
+        self._commands.clear()
+        for path in sorted(self.directory.iterdir()):
+            if path.name.startswith(("_", ".")):
+                continue
+            if path.is_dir() and (path / "__init__.py").exists():
+                source = path / "__init__.py"
+            elif path.suffix == ".py":
+                source = path
+            else:
+                continue
+
+            name = self.qualify(path.stem)
+            try:
+                declarations = _declarations(source)
+            except (SyntaxError, ValueError) as exc:
+                logger.exception("[%s] Could not read its declarations.", path.stem.upper(), exc_info=exc)
+                self.failed.add(name)
+                continue
+
+            requires = frozenset(map(self.qualify, declarations.get("__requires__", ())))
+            spec = self.specs[name] = ExtensionSpec(name, source, requires, tuple(declarations.get("__commands__", ())))
+            self._commands.update((command.casefold(), name) for command in spec.commands)
+
+        graph = {name: spec.requires for name, spec in self.specs.items()}
+        while True:
+            try:
+                graphlib.TopologicalSorter(graph).prepare()
+                break
+            except graphlib.CycleError as exc:
+                cycle: List[str] = exc.args[1]
+                logger.error("Extensions depend on each other in a cycle: %s", " -> ".join(cycle))
+                for name in cycle:
+                    graph.pop(name, None)
+                    self.failed.add(name)
+
+        return self.specs
+
+    async def load_all(self) -> None:
+        """Discovers the extensions and loads every one that is not lazy."""
+        self.discover()
+        eager = [name for name, spec in self.specs.items() if not spec.lazy and name not in self.failed]
+        lazy = len(self.specs) - len(eager)
+
+        logger.info("Loading %s extensions, %s more on first use...", len(eager), lazy)
+        started = time.perf_counter()
+        results = await asyncio.gather(*map(self.load, eager))
+        logger.info("Loaded %s of %s extensions in %.2fs.", sum(results), len(eager), time.perf_counter() - started)
+
+    async def load(self, name: str) -> bool:
+        """Loads an extension after its dependencies, returning whether it is loaded.
+
+        Concurrent calls for the same extension share one load.
+        """
+        name = self.qualify(name)
+        if name in self.bot.extensions:
+            return True
+        if name in self.failed:
+            return False
+
+        task = self._pending.get(name)
+        if task is None:
+            task = self._pending[name] = asyncio.ensure_future(self._load(name))
+            task.add_done_callback(lambda _: self._pending.pop(name, None))
+
+        return await asyncio.shield(task)
+
+    async def _load(self, name: str) -> bool:
+        short = name.rpartition(".")[2].upper()
+        spec: Optional[ExtensionSpec] = self.specs.get(name)
+        if spec is not None and spec.requires:
+            if not all(await asyncio.gather(*map(self.load, spec.requires))):
+                logger.warning("[%s] Skipped, a dependency failed to load.", short)
+                self.failed.add(name)
+                return False
+
+        started = time.perf_counter()
+        try:
+            await self.bot.load_extension(name)
+        except Exception as exc:
+            logger.exception("[%s] Failed to load.", short, exc_info=exc)
+            self.failed.add(name)
+            return False
+
+        elapsed = self.timings[name] = time.perf_counter() - started
+        logger.info("[%s] Loaded in %.1fms.", short, elapsed * 1000)
+        return True
+
+    async def _load_on_demand(self, ctx: Context) -> None:
+        if ctx.command is not None or ctx.invoked_with is None:
+            return
+
+        name = self._commands.get(ctx.invoked_with.casefold())
+        if name is not None and await self.load(name):
+            ctx.command = self.bot.all_commands.get(ctx.invoked_with)
+
+    def report(self) -> Dict[str, float]:
+        """Load times in milliseconds, slowest first."""
+        return {name: elapsed * 1000 for name, elapsed in sorted(self.timings.items(), key=lambda item: -item[1])}
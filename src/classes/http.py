@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import pathlib
+
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional
+
+import aiohttp
+
+from src.base import RequestFailed
+from src.utils import LruCache, make_async
+
+__all__ = ("WebClient", "WebResponse")
+logger = logging.getLogger(__name__)
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+# Headers a 304 Not Modified may refresh on the stored response.
+REVALIDATED_HEADERS = frozenset({"cache-control", "date", "etag", "expires", "last-modified"})
+
+
+class WebResponse(NamedTuple):
+    """A fully read response. Header names are lowercased."""
+
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("last-modified")
+
+    def max_age(self) -> int:
+        control = self.headers.get("cache-control", "")
+        if "no-cache" in control or "no-store" in control:
+            return 0
+        match = MAX_AGE.search(control)
+        return int(match.group(1)) if match else 0
+
+    def cacheable(self) -> bool:
+        control = self.headers.get("cache-control", "")
+        return self.status == 200 and "no-store" not in control and bool(self.etag or self.last_modified or self.max_age())
+
+
+class WebClient:
+    """A shared HTTP client with connection pooling and an on-disk response cache.
+
+    GET responses carrying an ``ETag``, ``Last-Modified`` or ``max-age`` are stored
+    on disk. Fresh entries are served without a request and stale ones are
+    revalidated with a conditional request, so an unchanged asset costs a
+    ``304 Not Modified`` at most. Concurrent requests for the same URL share one
+    request, and :meth:`stream` reads large bodies in chunks without caching them.
+    The oldest entries are pruned once the disk cache grows past ``max_cache_size``
+    bytes, and entries untouched for ``max_cache_age`` seconds on startup. Only
+    bodies up to ``max_memory_body`` bytes are also kept in memory.
+
+    Examples
+    --------
+    >>> image = await bot.web.read("https://twemoji.maxcdn.com/v/latest/72x72/1f98a.png")
+    ... async for chunk in bot.web.stream(url):
+    ...     ...
+    """
+
+    def __init__(
+        self,
+        *,
+        cache_dir: pathlib.Path = pathlib.Path("cache/http"),
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+        max_cached_body: int = 8 * 1024 * 1024,
+        max_cache_size: int = 256 * 1024 * 1024,
+        max_cache_age: float = 30 * 24 * 60 * 60,
+        max_memory_body: int = 256 * 1024,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.max_cached_body = max_cached_body
+        self.max_cache_size = max_cache_size
+        self.max_cache_age = max_cache_age
+        self.max_memory_body = max_memory_body
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Holds at most 64 bodies of max_memory_body bytes; larger ones are only read from disk.
+        self._memory: LruCache = LruCache(64)
+        self._inflight: Dict[str, asyncio.Future[WebResponse]] = {}
+        # Estimated size of the disk cache in bytes, recounted whenever it is pruned.
+        self._disk_size: int = 0
+        self._pruning: Optional[asyncio.Future[None]] = None
+
+    async def start(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+        await make_async(self.cache_dir.mkdir)(parents=True, exist_ok=True)
+        await make_async(self._prune)(max_age=self.max_cache_age)
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _paths(self, url: str) -> tuple[pathlib.Path, pathlib.Path]:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return self.cache_dir / f"{digest}.body", self.cache_dir / f"{digest}.json"
+
+    def _load(self, url: str) -> Optional[tuple[WebResponse, float]]:
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        return WebResponse(url, meta["status"], meta["headers"], body), meta["stored_at"]
+
+    def _store(self, response: WebResponse, stored_at: float) -> None:
+        body_path, meta_path = self._paths(response.url)
+        body_path.write_bytes(response.body)
+        meta_path.write_text(json.dumps({"status": response.status, "headers": response.headers, "stored_at": stored_at}))
+
+    def _touch(self, response: WebResponse, stored_at: float) -> None:
+        _, meta_path = self._paths(response.url)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return self._store(response, stored_at)
+        meta.update(headers=response.headers, stored_at=stored_at)
+        meta_path.write_text(json.dumps(meta))
+
+    def _prune(self, *, max_age: Optional[float] = None) -> None:
+        """Deletes expired entries, then the least recently stored ones until the cache fits ``max_cache_size``."""
+        entries = []
+        for body_path in self.cache_dir.glob("*.body"):
+            meta_path = body_path.with_suffix(".json")
+            try:
+                size = body_path.stat().st_size
+            except OSError:
+                continue
+            try:
+                used_at = meta_path.stat().st_mtime
+            except OSError:
+                # A body without metadata can never be served, so it goes first.
+                used_at = 0.0
+            entries.append((used_at, size, body_path, meta_path))
+        entries.sort()
+
+        total = sum(size for _, size, _, _ in entries)
+        cutoff = time.time() - max_age if max_age is not None else 0.0
+        removed = 0
+        for used_at, size, body_path, meta_path in entries:
+            if total <= self.max_cache_size and used_at >= cutoff:
+                break
+            body_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        self._disk_size = total
+        if removed:
+            logger.debug("Pruned %s entries from the web cache, %s bytes remain.", removed, total)
+
+    def _schedule_prune(self) -> None:
+        if self._pruning is None or self._pruning.done():
+            self._pruning = asyncio.ensure_future(make_async(self._prune)())
+
+    async def fetch(self, url: str, *, use_cache: bool = True) -> WebResponse:
+        """GETs ``url``, going through the cache and sharing in-flight requests."""
+        if not use_cache:
+            return await self._request(url, None)
+
+        if (task := self._inflight.get(url)) is None:
+            task = self._inflight[url] = asyncio.ensure_future(self._fetch(url))
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    def _remember(self, response: WebResponse, stored_at: float) -> None:
+        if len(response.body) <= self.max_memory_body:
+            self._memory[response.url] = (response, stored_at)
+        else:
+            self._memory.pop(response.url, None)
+
+    async def _fetch(self, url: str) -> WebResponse:
+        if url in self._memory:
+            cached = self._memory[url]
+        else:
+            cached = await make_async(self._load)(url)
+
+        if cached is not None:
+            response, stored_at = cached
+            if time.time() - stored_at < response.max_age():
+                self._remember(response, stored_at)
+                return response
+
+            revalidated = await self._request(url, response)
+            if revalidated.status == 304:
+                response = revalidated._replace(status=response.status)
+                now = time.time()
+                self._remember(response, now)
+                await make_async(self._touch)(response, now)
+                return response
+            response = revalidated
+        else:
+            response = await self._request(url, None)
+
+        if response.cacheable() and len(response.body) <= self.max_cached_body:
+            now = time.time()
+            self._remember(response, now)
+            await make_async(self._store)(response, now)
+            self._disk_size += len(response.body)
+            if self._disk_size > self.max_cache_size:
+                self._schedule_prune()
+        return response
+
+    async def _request(self, url: str, cached: Optional[WebResponse]) -> WebResponse:
+        headers: Dict[str, str] = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        async with self.session.get(url, headers=headers) as resp:  # type: ignore
+            headers = {key.lower(): value for key, value in resp.headers.items()}
+            if resp.status == 304 and cached is not None:
+                logger.debug("Revalidated %s from cache.", url)
+                # The 304 carries the refreshed validators and freshness, the body stays the cached one.
+                refreshed = {key: value for key, value in headers.items() if key in REVALIDATED_HEADERS}
+                return WebResponse(url, resp.status, {**cached.headers, **refreshed}, cached.body)
+            body = await resp.read()
+            return WebResponse(url, resp.status, headers, body)
+
+    async def read(self, url: str, **kwargs: Any) -> bytes:
+        """Returns the body of ``url``, raising :class:`RequestFailed` for any non-2xx status."""
+        response = await self.fetch(url, **kwargs)
+        if not 200 <= response.status < 300:
+            raise RequestFailed(url, response.status)
+        return response.body
+
+    async def text(self, url: str, *, encoding: str = "utf-8", **kwargs: Any) -> str:
+        return (await self.read(url, **kwargs)).decode(encoding, errors="replace")
+
+    async def json(self, url: str, **kwargs: Any) -> Any:
+        return json.loads(await self.read(url, **kwargs))
+
+    async def stream(self, url: str, *, chunk_size: int = 64 * 1024, max_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yields the body of ``url`` in chunks, stopping once ``max_size`` bytes were read."""
+        received = 0
+        async with self.session.get(url) as resp:  # type: ignore
+            resp.raise_for_status()
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                received += len(chunk)
+                if max_size is not None and received > max_size:
+                    raise ValueError(f"Response from {url} exceeded {max_size} bytes.")
+                yield chunk
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import enum
+import logging
+
+from typing import Any, Callable, Dict
+
+import discord
+
+from src.utils import StatusStore
+
+__all__ = ("CacheProfile", "install_status_tracking")
+logger = logging.getLogger(__name__)
+
+Parser = Callable[[Dict[str, Any]], None]
+
+
+class CacheProfile(enum.Enum):
+    """How much of the member and presence state discord.py keeps around.
+
+    ``FULL`` keeps every presence, activities included, on its member. ``LEAN``
+    never builds presence objects at all: statuses live in a :class:`StatusStore`
+    and ``Member.status`` and ``Member.activities`` stay at their defaults.
+    """
+
+    FULL = "full"
+    LEAN = "lean"
+
+    def member_cache_flags(self, intents: discord.Intents) -> discord.MemberCacheFlags:
+        flags = discord.MemberCacheFlags.from_intents(intents)
+        if self is CacheProfile.LEAN:
+            # Members stay cached when they joined or were chunked, never just for sitting in voice.
+            flags.voice = False
+        return flags
+
+
+def install_status_tracking(client: discord.Client, statuses: StatusStore, profile: CacheProfile) -> None:
+    """Keeps ``statuses`` up to date from the gateway and dispatches ``status_update`` events.
+
+    ``on_status_update(user_id, before, after)`` fires once per actual change of a
+    user's status, however many guilds the user shares with the bot. Under the
+    lean profile presences are read straight from the payloads, and only the
+    user updates they carry are applied to the cache.
+
+    Examples
+    --------
+    >>> install_status_tracking(bot, bot.statuses, CacheProfile.LEAN)
+    ... bot.statuses.get(user_id)
+    <Status.online: 'online'>
+    """
+    state = client._connection
+    lean = profile is CacheProfile.LEAN
+    parse_guild_create: Parser = state.parsers["GUILD_CREATE"]
+    parse_presence_update: Parser = state.parsers["PRESENCE_UPDATE"]
+
+    def guild_create(data: Dict[str, Any]) -> None:
+        presences = data.pop("presences", ()) if lean else data.get("presences", ())
+        for presence in presences:
+            statuses.set(int(presence["user"]["id"]), presence.get("status", "offline"))
+        parse_guild_create(data)
+
+    def presence_update(data: Dict[str, Any]) -> None:
+        guild = state._get_guild(discord.utils._get_as_snowflake(data, "guild_id"))
+        if guild is None:
+            logger.debug("PRESENCE_UPDATE referencing an unknown guild ID: %s. Discarding.", data.get("guild_id"))
+            return
+
+        user = data["user"]
+        if not lean:
+            parse_presence_update(data)
+        elif len(user) > 1 and (member := guild.get_member(int(user["id"]))) is not None:
+            # Name and avatar changes arrive as presence updates too, and the bot records those.
+            if (update := member._update_inner_user(user)) is not None:
+                client.dispatch("user_update", *update)
+
+        user_id = int(user["id"])
+        before = statuses.set(user_id, data.get("status", "offline"))
+        if (after := statuses.get(user_id)) is not before:
+            client.dispatch("status_update", user_id, before, after)
+
+    state.parsers["GUILD_CREATE"] = guild_create
+    state.parsers["PRESENCE_UPDATE"] = presence_update
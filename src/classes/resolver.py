@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import discord
+
+from src.utils import LruCache
+
+if TYPE_CHECKING:
+    from . import RoboMoxie
+
+__all__ = ("Resolver",)
+logger = logging.getLogger(__name__)
+
+ResolvedChannel = Union[discord.abc.GuildChannel, discord.abc.PrivateChannel, discord.Thread]
+
+
+class Resolver:
+    """Resolves channels, guilds and users, falling back to the REST API.
+
+    The gateway cache is always consulted first. Objects that had to be fetched
+    are kept for ``time_to_live`` seconds, and objects that could not be fetched
+    (not found or forbidden) are remembered as missing for ``negative_time_to_live``
+    seconds, so an inaccessible channel costs at most one HTTP call per window.
+    Concurrent lookups of the same object share a single in-flight request.
+
+    Examples
+    --------
+    >>> channel = await bot.resolver.channel(1059817715583430667)
+    ... if channel is not None:
+    ...     await channel.send("hello")
+    """
+
+    def __init__(
+        self,
+        bot: RoboMoxie,
+        *,
+        time_to_live: float = 300.0,
+        negative_time_to_live: float = 60.0,
+        maxsize: int = 1024,
+    ) -> None:
+        self.bot = bot
+        self.time_to_live = time_to_live
+        self.negative_time_to_live = negative_time_to_live
+
+        self._cache: LruCache = LruCache(maxsize)
+        self._pending: Dict[Tuple[str, int], asyncio.Future[Any]] = {}
+
+    async def channel(self, channel_id: int, /) -> Optional[ResolvedChannel]:
+        return await self._resolve("channel", channel_id, self.bot.get_channel, self.bot.fetch_channel)
+
+    async def guild(self, guild_id: int, /) -> Optional[discord.Guild]:
+        return await self._resolve("guild", guild_id, self.bot.get_guild, self.bot.fetch_guild)
+
+    async def user(self, user_id: int, /) -> Optional[discord.User]:
+        return await self._resolve("user", user_id, self.bot.get_user, self.bot.fetch_user)
+
+    async def warm(self, *channel_ids: int) -> None:
+        """Pre-resolves channels that are known to be needed, e.g. the transcript channel."""
+        results = await asyncio.gather(*(self.channel(channel_id) for channel_id in channel_ids), return_exceptions=True)
+        for channel_id, result in zip(channel_ids, results):
+            if isinstance(result, BaseException):
+                logger.warning("Failed to pre-resolve channel %s.", channel_id, exc_info=result)
+            elif result is None:
+                logger.warning("Channel %s is not accessible.", channel_id)
+
+    def invalidate(self, kind: str, object_id: int, /) -> None:
+        self._cache.pop((kind, object_id), None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    async def _resolve(
+        self,
+        kind: str,
+        object_id: int,
+        getter: Callable[[int], Any],
+        fetcher: Callable[[int], Awaitable[Any]],
+    ) -> Any:
+        if (found := getter(object_id)) is not None:
+            return found
+
+        key = (kind, object_id)
+        if key in self._cache:
+            value, expires_at = self._cache[key]
+            if expires_at > time.monotonic():
+                return value
+            del self._cache[key]
+
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._fetch(key, fetcher))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        # Shielded so that one cancelled waiter does not cancel the fetch for everyone else.
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: Tuple[str, int], fetcher: Callable[[int], Awaitable[Any]]) -> Any:
+        kind, object_id = key
+        try:
+            value = await fetcher(object_id)
+        except (discord.NotFound, discord.Forbidden, discord.InvalidData) as exc:
+            logger.debug("Failed to fetch %s %s, caching as missing.", kind, object_id, exc_info=exc)
+            value, time_to_live = None, self.negative_time_to_live
+        else:
+            time_to_live = self.time_to_live
+
+        self._cache[key] = (value, time.monotonic() + time_to_live)
+        return value
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import os
+import mmap
+import zlib
+import struct
+import pathlib
+
+from typing import Any, List, NamedTuple, Tuple
+
+from src.base import InvalidSnapshot
+
+__all__ = ("CacheSnapshot",)
+
+MAGIC = b"MXCS"
+VERSION = 1
+
+# magic, version, synced_at, crc32 of the body, then the number of users, guilds and prefixes.
+HEADER = struct.Struct("<4sHdIIII")
+USER = struct.Struct("<qq")  # user_id, emoji_server_id
+GUILD = struct.Struct("<q?H")  # guild_id, score_counting, length of score_prefix
+PREFIX = struct.Struct("<qH")  # guild_id, length of prefix
+
+
+class CacheSnapshot(NamedTuple):
+    """The database-backed caches of the bot, as a compact binary file.
+
+    ``synced_at`` is the database time from which changes may be missing from
+    the cached rows, so rows stamped since are what a restore refetches. The file
+    is a fixed header followed by packed users, guilds and prefixes, and is
+    checked against its magic, version and a CRC32 of the body when read.
+
+    Examples
+    --------
+    >>> CacheSnapshot(synced_at, [(user_id, 0)], [(guild_id, True, "owo")], [(guild_id, "fishie")]).dump(path)
+    ... snapshot = CacheSnapshot.load(path)
+    """
+
+    synced_at: float
+    users: List[Tuple[int, int]]
+    guilds: List[Tuple[int, bool, str]]
+    prefixes: List[Tuple[int, str]]
+
+    def dump(self, path: pathlib.Path) -> int:
+        """Writes the snapshot atomically and returns its size in bytes."""
+        body = bytearray()
+        for user in self.users:
+            body += USER.pack(*user)
+        for guild_id, score_counting, score_prefix in self.guilds:
+            encoded = score_prefix.encode()
+            body += GUILD.pack(guild_id, score_counting, len(encoded)) + encoded
+        for guild_id, prefix in self.prefixes:
+            encoded = prefix.encode()
+            body += PREFIX.pack(guild_id, len(encoded)) + encoded
+
+        header = HEADER.pack(
+            MAGIC, VERSION, self.synced_at, zlib.crc32(body), len(self.users), len(self.guilds), len(self.prefixes)
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        with temporary.open("wb") as file:
+            file.write(header)
+            file.write(body)
+        os.replace(temporary, path)
+        return len(header) + len(body)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> CacheSnapshot:
+        """Reads a snapshot through a memory map. Raises :exc:`FileNotFoundError` or :exc:`InvalidSnapshot`."""
+        with path.open("rb") as file:
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise InvalidSnapshot(str(path), "truncated header")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    return cls._parse(str(path), view)
+
+    @classmethod
+    def _parse(cls, path: str, view: memoryview) -> CacheSnapshot:
+        magic, version, synced_at, checksum, users, guilds, prefixes = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise InvalidSnapshot(path, "not a cache snapshot")
+        if version != VERSION:
+            raise InvalidSnapshot(path, f"version {version}, expected {VERSION}")
+
+        with view[HEADER.size :] as body:
+            if zlib.crc32(body) != checksum:
+                raise InvalidSnapshot(path, "checksum mismatch")
+
+            try:
+                offset = USER.size * users
+                restored_users = list(USER.iter_unpack(body[:offset]))
+                restored_guilds, offset = _unpack_strings(body, offset, GUILD, guilds)
+                restored_prefixes, offset = _unpack_strings(body, offset, PREFIX, prefixes)
+            except (struct.error, UnicodeDecodeError) as exc:
+                raise InvalidSnapshot(path, "malformed body") from exc
+            if offset != len(body):
+                raise InvalidSnapshot(path, "trailing data")
+
+        return cls(synced_at, restored_users, restored_guilds, restored_prefixes)  # type: ignore
+
+
+def _unpack_strings(body: memoryview, offset: int, layout: struct.Struct, count: int) -> Tuple[List[Tuple[Any, ...]], int]:
+    # Each row is ``layout`` ending in a length, followed by that many bytes of UTF-8.
+    rows: List[Tuple[Any, ...]] = []
+    for _ in range(count):
+        *fields, length = layout.unpack_from(body, offset)
+        offset += layout.size
+        if offset + length > len(body):
+            raise struct.error("string runs past the end of the snapshot")
+        rows.append((*fields, str(body[offset : offset + length], "utf-8")))
+        offset += length
+    return rows, offset
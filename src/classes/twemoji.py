@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import io
+import os
+import json
+import mmap
+import asyncio
+import logging
+import pathlib
+
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from src.base import RequestFailed
+from src.utils import make_async
+
+if TYPE_CHECKING:
+    from . import RoboMoxie
+
+__all__ = ("EmojiAtlas", "emoji_key")
+logger = logging.getLogger(__name__)
+
+ZWJ: str = "\u200d"
+VS16: str = "\ufe0f"
+
+
+def emoji_key(emoji: str, /) -> str:
+    """Returns the twemoji asset name of ``emoji``, e.g. ``"1f98a"`` or ``"1f469-200d-1f4bb"``.
+
+    Like twemoji itself, the variation selector is dropped unless the emoji is a ZWJ sequence.
+    """
+    if ZWJ not in emoji:
+        emoji = emoji.replace(VS16, "")
+    return "-".join(f"{ord(char):x}" for char in emoji)
+
+
+class EmojiAtlas:
+    """A local, memory-mapped store of twemoji PNGs.
+
+    Every image lives in a single append-only ``atlas.bin`` file, and ``index.json``
+    maps an emoji's codepoint sequence to its ``(offset, length)`` in it. Reads are
+    slices of the memory map, so rendering an emoji that was seen before never
+    touches the network. Unknown emojis are downloaded once, appended and
+    persisted; sequences twemoji has no asset for are remembered as missing.
+
+    Examples
+    --------
+    >>> data = await bot.twemoji.get("🦊")
+    ... if data is not None:
+    ...     image = Image.open(io.BytesIO(data))
+    """
+
+    BASE_URL: str = "https://cdn.jsdelivr.net/gh/twitter/twemoji@14.0.2/assets/72x72/{}.png"
+    # Appended images held in memory before the atlas is mapped again.
+    REMAP_THRESHOLD: int = 1024 * 1024
+
+    def __init__(self, bot: RoboMoxie, *, directory: pathlib.Path = pathlib.Path("cache/twemoji")) -> None:
+        self.bot = bot
+        self.directory = directory
+        self.atlas_path = directory / "atlas.bin"
+        self.index_path = directory / "index.json"
+
+        self._index: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._map: Optional[mmap.mmap] = None
+        self._size: int = 0
+        self._tail: Dict[str, bytes] = {}
+        self._tail_size: int = 0
+        self._lock = asyncio.Lock()
+        self._pending: Dict[str, asyncio.Future[Optional[bytes]]] = {}
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self._index.values())
+
+    def __contains__(self, emoji: str) -> bool:
+        return self._index.get(emoji_key(emoji)) is not None
+
+    async def open(self) -> None:
+        index, mapped, size = await make_async(self._load)()
+        async with self._lock:
+            self._index = index
+            self._swap(mapped, size)
+        logger.info("Loaded %s emojis (%s bytes) from the twemoji atlas.", len(self), self._size)
+
+    def _load(self) -> Tuple[Dict[str, Optional[Tuple[int, int]]], Optional[mmap.mmap], int]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.atlas_path.touch(exist_ok=True)
+        try:
+            entries = json.loads(self.index_path.read_text())["entries"]
+        except (OSError, ValueError, KeyError):
+            entries = {}
+
+        mapped, size = self._map_atlas()
+        # Entries pointing past the end of the atlas belong to an append that never completed.
+        index = {
+            key: (tuple(entry) if entry is not None else None)
+            for key, entry in entries.items()
+            if entry is None or entry[0] + entry[1] <= size
+        }
+        return index, mapped, size  # type: ignore
+
+    def _map_atlas(self) -> Tuple[Optional[mmap.mmap], int]:
+        # Builds a fresh map and leaves the current one alone; it is swapped in on the event loop.
+        size = self.atlas_path.stat().st_size
+        if not size:
+            return None, 0
+        with self.atlas_path.open("rb") as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), size
+
+    def _swap(self, mapped: Optional[mmap.mmap], size: int) -> None:
+        # Runs on the event loop, so no read can be slicing the old map while it is closed.
+        previous, self._map, self._size = self._map, mapped, size
+        self._tail.clear()
+        self._tail_size = 0
+        if previous is not None:
+            previous.close()
+
+    async def close(self) -> None:
+        async with self._lock:
+            self._swap(None, 0)
+
+    def read(self, emoji: str, /) -> Optional[bytes]:
+        """Returns the PNG of ``emoji`` if it is already in the atlas, without fetching it."""
+        key = emoji_key(emoji)
+        if (entry := self._index.get(key)) is None:
+            return None
+        offset, length = entry
+        if self._map is not None and offset + length <= self._size:
+            return self._map[offset : offset + length]
+        # Appended since the atlas was last mapped.
+        return self._tail.get(key)
+
+    async def get(self, emoji: str, /) -> Optional[bytes]:
+        """Returns the PNG of ``emoji``, downloading and storing it on the first use.
+
+        Returns ``None`` if twemoji has no asset for it.
+        """
+        key = emoji_key(emoji)
+        if key in self._index:
+            return self.read(emoji)
+
+        if (task := self._pending.get(key)) is None:
+            task = self._pending[key] = asyncio.ensure_future(self._fetch(key))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def buffer(self, emoji: str, /) -> Optional[io.BytesIO]:
+        data = await self.get(emoji)
+        return io.BytesIO(data) if data is not None else None
+
+    async def warm(self, emojis: Iterable[str], *, concurrency: int = 8) -> None:
+        """Downloads every emoji of ``emojis`` that is not in the atlas yet, e.g. to prebuild it."""
+        semaphore = asyncio.Semaphore(concurrency)
+        missing = {emoji_key(emoji): emoji for emoji in emojis if emoji_key(emoji) not in self._index}
+
+        async def fetch(emoji: str) -> None:
+            async with semaphore:
+                await self.get(emoji)
+
+        results = await asyncio.gather(*map(fetch, missing.values()), return_exceptions=True)
+        for emoji, result in zip(missing.values(), results):
+            if isinstance(result, BaseException):
+                logger.warning("Failed to add %s to the twemoji atlas.", emoji_key(emoji), exc_info=result)
+
+    async def _fetch(self, key: str) -> Optional[bytes]:
+        try:
+            data = await self.bot.web.read(self.BASE_URL.format(key), use_cache=False)
+        except RequestFailed as exc:
+            if exc.status != 404:
+                raise
+            logger.debug("Twemoji has no asset for %s, caching as missing.", key)
+            data = None
+
+        async with self._lock:
+            if data is None:
+                self._index[key] = None
+            else:
+                offset = await make_async(self._append)(data)
+                # Kept in memory until the next remap, instead of re-mapping the whole atlas for every emoji.
+                self._tail[key] = data
+                self._tail_size += len(data)
+                self._index[key] = (offset, len(data))
+                if self._tail_size >= self.REMAP_THRESHOLD:
+                    self._swap(*await make_async(self._map_atlas)())
+            await make_async(self._save_index)(dict(self._index))
+        return data
+
+    def _append(self, data: bytes) -> int:
+        with self.atlas_path.open("ab") as file:
+            offset = file.seek(0, os.SEEK_END)
+            file.write(data)
+        return offset
+
+    def _save_index(self, index: Dict[str, Optional[Tuple[int, int]]]) -> None:
+        temporary = self.index_path.with_suffix(".tmp")
+        entries: Dict[str, Optional[List[int]]] = {
+            key: (list(entry) if entry is not None else None) for key, entry in index.items()
+        }
+        temporary.write_text(json.dumps({"version": 1, "entries": entries}))
+        os.replace(temporary, self.index_path)
@@ -45,6 +45,11 @@ class Settings(BaseSettings):
     OWNER_IDS: str
     TRANSCRIPT_CHANNEL: int
 
+    # eager, lazy or on_demand; only eager records user history in every guild, see ChunkPolicy.
+    CHUNK_POLICY: str = "eager"
+    CHUNK_CONCURRENCY: int = 2
+    CACHE_PROFILE: str = "lean"  # full or lean
+
     class Config(BaseSettings.Config):
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -21,24 +21,25 @@ DEALINGS IN THE SOFTWARE.
 """
 from __future__ import annotations
 
+import io
 import re
 import uuid
 import imghdr
 import asyncio
 import aiohttp
 import datetime
+import functools
 
 from typing import ClassVar, Dict
 
 import discord
 from discord.ext import commands
 
-from src.config import Settings
 from src.models import Guild, User
 from src.base import BaseEventExtension
+from src.utils import Priority
 
 __all__ = ("BackendEventHandler",)
-settings: Settings = Settings()  # type: ignore
 
 
 class BackendEventHandler(BaseEventExtension):
@@ -53,7 +54,7 @@ class BackendEventHandler(BaseEventExtension):
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild) -> None:
-        members = await guild.chunk(cache=True) if not guild.chunked else guild.members
+        members = await self.bot.chunker.chunk(guild)
         await Guild.create_or_update(guild.id, True, 'owo', self.bot)
 
         for_execution = []
@@ -83,15 +84,34 @@ class BackendEventHandler(BaseEventExtension):
         await self.bot.db.execute_many(image_query, avatar_images)
         await self.bot.db.execute_many(avatar_query, avatar_bytes)
 
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        self.bot.member_index.drop(guild.id)
+
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member) -> None:
+        self.bot.member_index.add(member)
         if member.bot or member.guild.chunked or len(member.mutual_guilds) > 1:
             return
 
         await User.insert_maybe_user(member.id, self.bot)
 
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        if before.nick != after.nick:
+            self.bot.member_index.add(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member) -> None:
+        self.bot.member_index.remove(member)
+
     @commands.Cog.listener()
     async def on_user_update(self, before: discord.Member, after: discord.Member) -> None:
+        if before.name != after.name or getattr(before, "global_name", None) != getattr(after, "global_name", None):
+            for guild in after.mutual_guilds:
+                if (member := guild.get_member(after.id)) is not None:
+                    self.bot.member_index.add(member)
+
         if before.bot:
             return  # No more stealing my precious storage space
 
@@ -112,7 +132,7 @@ class BackendEventHandler(BaseEventExtension):
         if before.bot:
             return  # Naughty bots
 
-        transcript = await self.bot.get_or_fetch_channel(settings.TRANSCRIPT_CHANNEL)
+        transcript = await self.bot.get_or_fetch_channel(self.bot.settings.TRANSCRIPT_CHANNEL)
 
         try:
             avatar = await after.display_avatar.read()
@@ -126,35 +146,37 @@ class BackendEventHandler(BaseEventExtension):
 
         if transcript is not None:
             filename = f"{uuid.uuid4().hex[:16]}.png"
-            message = await transcript.send(file=discord.File(avatar, filename=filename), content="Free real estate")
+            upload = functools.partial(
+                transcript.send, file=discord.File(io.BytesIO(avatar), filename=filename), content="Free real estate"
+            )
+            message = await self.bot.outbox.schedule(transcript.id, upload, priority=Priority.BACKGROUND)
             await User.insert_history_item(after, "url", message.attachments[0].url, self.bot)
 
     @commands.Cog.listener()
-    async def on_presence_update(self, before: discord.Member, after: discord.Member) -> None:
-        if before.bot:
+    async def on_status_update(self, user_id: int, before: discord.Status, after: discord.Status) -> None:
+        if (user := self.bot.get_user(user_id)) is None or user.bot:
             return
 
-        if before.status != after.status:
-            query = """
-                    INSERT INTO activity_history (
-                    user_id,
-                    seconds_%s,
-                    seconds_%s,
-                    last_update, last_status)
-                VALUES ($1, $2, $3, $4, $5)
-                ON CONFLICT (user_id)
-                DO UPDATE SET 
-                    seconds_%s = activity_history.seconds_%s + 
-                    EXTRACT(EPOCH FROM ($4 - activity_history.last_update)),
-                    last_update = $4, 
-                    last_status = $5
-            """ % (
-                self.status_text[before.status],
-                self.status_text[after.status],
-                self.status_text[before.status],
-                self.status_text[after.status],
-            )
+        query = """
+                INSERT INTO activity_history (
+                user_id,
+                seconds_%s,
+                seconds_%s,
+                last_update, last_status)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (user_id)
+            DO UPDATE SET 
+                seconds_%s = activity_history.seconds_%s + 
+                EXTRACT(EPOCH FROM ($4 - activity_history.last_update)),
+                last_update = $4, 
+                last_status = $5
+        """ % (
+            self.status_text[before],
+            self.status_text[after],
+            self.status_text[before],
+            self.status_text[after],
+        )
 
-            await self.bot.db.execute(
-                query, before.id, 0, 0, datetime.datetime.now(tz=datetime.timezone.utc), self.status_text[after.status]
-            )
+        await self.bot.db.execute(
+            query, user_id, 0, 0, datetime.datetime.now(tz=datetime.timezone.utc), self.status_text[after]
+        )
@@ -33,18 +33,28 @@ from discord.ext import commands
 if TYPE_CHECKING:
     from src.classes import Context, RoboMoxie
 
-from src.classes import MoxieEmbed
-from src.utils import TimeToLiveCache
+from src.classes import EmbedTemplate
+from src.utils import MemoryBackend, RateLimit, RateLimiter
 from src.base import BaseEventExtension
 
 
 class EventDispatcher(BaseEventExtension):
     """Dispatches events to the appropriate listeners."""
 
+    # Built once; each error only fills in its details.
+    MISSING_ARGUMENT = EmbedTemplate(title="Oh no! moxie ran into an error :s", description="```sh\n{details}```")
+    MEMBER_NOT_FOUND = EmbedTemplate(
+        title="moxie could not find what you were looking for :s", description="```sh\n{details}```"
+    )
+    MISSING_PERMISSIONS = EmbedTemplate(
+        title="Looks like you don't have the permissions to do that :s", description="```sh\n{details}```"
+    )
+
     def __init__(self, bot: RoboMoxie) -> None:
         super().__init__(bot)
 
-        self.cached_ttl: TimeToLiveCache = TimeToLiveCache()
+        # One cooldown notice per user for as long as their cooldown lasts.
+        self.cooldown_notices: RateLimiter = RateLimiter(1, 1.0, backend=MemoryBackend(maxsize=4096))
         self.error_handlers: Dict[Any, Callable[[Context, commands.CommandError], None]] = {
             commands.errors.NoPrivateMessage: lambda *_: None,
             commands.errors.BotMissingPermissions: lambda *_: None,
@@ -69,15 +79,6 @@ class EventDispatcher(BaseEventExtension):
             ),
         }
 
-    def insert_user_rate_limit(self, user: discord.Member, rate_limit: int | float) -> None:
-        self.cached_ttl.user_time_to_lives[user.id] = datetime.timedelta(seconds=rate_limit)
-
-    def check_user_rate_limited(self, user: discord.Member) -> bool:
-        time_to_live = self.cached_ttl.user_time_to_lives.get(user.id, None)
-        if time_to_live:
-            return user.id in self.cached_ttl.lrucache and self.cached_ttl.lrucache[user.id] > datetime.datetime.utcnow()
-        return False
-
     @commands.Cog.listener()
     async def on_command_error(self, ctx: Context, error: commands.CommandError) -> None:
 
@@ -126,12 +127,12 @@ class EventDispatcher(BaseEventExtension):
             await self.bot.process_commands(message)
 
     async def handle_command_on_cooldown(self, ctx: Context, error: commands.CommandOnCooldown) -> None:
-        if self.check_user_rate_limited(ctx.author):
+        notice = await self.cooldown_notices.hit(ctx.author.id, limit=RateLimit(1, max(error.retry_after, 1.0)))
+        if notice.limited:
             return
 
-        self.insert_user_rate_limit(ctx.author, error.retry_after)
         timestamp = discord.utils.format_dt(
-            datetime.datetime.utcnow() + datetime.timedelta(seconds=error.retry_after), style="R"
+            discord.utils.utcnow() + datetime.timedelta(seconds=error.retry_after), style="R"
         )
         await ctx.send(
             "⏰ | %s, you are on cooldown. Try again in %s." % (ctx.author.mention, timestamp), delete_after=error.retry_after
@@ -183,11 +184,9 @@ class EventDispatcher(BaseEventExtension):
         spaces = ' ' * len(str(lineo))
         error_message += f'\n{spaces} |\n{spaces} |'
 
-        embed = MoxieEmbed.factory(
-            ctx=ctx,
-            title="Oh no! moxie ran into an error :s",
-            description=(
-                "```sh\n"
+        embed = EventDispatcher.MISSING_ARGUMENT.render(
+            ctx,
+            details=(
                 "error: missing required argument\n"
                 f"{spaces}--> $ext/{cog_display.lower()}.py:{lineo}:{lineo + 1}\n"
                 f"{spaces} |\n"
@@ -196,7 +195,6 @@ class EventDispatcher(BaseEventExtension):
                 f"{spaces} | => {ctx.command.brief}\n"
                 f"{spaces} |\n"
                 f"{spaces} | => For more information use help {ctx.command.name}"
-                "```"
             ),
         )
         await ctx.send(embed=embed)
@@ -205,17 +203,14 @@ class EventDispatcher(BaseEventExtension):
     async def handle_member_not_found(ctx: Context, error: commands.MemberNotFound) -> None:
         failed_to_convert = error.argument
         spaces = ' ' * len(str(ctx.command.callback.__code__.co_firstlineno))
-        embed = MoxieEmbed.factory(
-            ctx=ctx,
-            title="moxie could not find what you were looking for :s",
-            description=(
-                "```sh\n"
+        embed = EventDispatcher.MEMBER_NOT_FOUND.render(
+            ctx,
+            details=(
                 f"error: member not found\n"
                 f"{spaces} |\n"
                 f"{spaces} | => {failed_to_convert} is not a valid member\n"
                 f"{spaces} |\n"
                 f"{spaces} | => For more information use help {ctx.command.name}"
-                "```"
             ),
         )
         await ctx.send(embed=embed)
@@ -229,9 +224,7 @@ class EventDispatcher(BaseEventExtension):
         lineo = error.__traceback__.tb_frame.f_lineno
         spaces = ' ' * len(str(lineo + 1))
 
-        title = ("Looks like you don't have the permissions to do that :s",)
         description = (
-            "```sh\n"
             "error: missing permissions\n"
             f"{spaces} |--> $commands.MissingPermissions:{lineo}:{lineo + 1}\n"
             f"{spaces} |\n"
@@ -243,9 +236,5 @@ class EventDispatcher(BaseEventExtension):
 
         description += f"{spaces} |\n" f"{spaces} | => For more information use help {ctx.command.name}"
 
-        embed = MoxieEmbed.factory(
-            ctx=ctx,
-            title=title,
-            description=description,
-        )
+        embed = EventDispatcher.MISSING_PERMISSIONS.render(ctx, details=description)
         await ctx.send(embed=embed)
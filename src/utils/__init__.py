@@ -24,4 +24,14 @@ from .datastructures import *
 from .async_utils import *
 from .decorators import *
 from .converter import *
+from .search import *
+from .ratelimit import *
+from .profiling import *
+from .metrics import *
+from .importing import *
+from .imaging import *
+from .processing import *
+from .executors import *
+from .shell import *
+from .outbox import *
 from .math import *
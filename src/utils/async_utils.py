@@ -109,20 +109,29 @@ class TimeToLiveCache:
 
 
 class Key:
+    # Arguments compare by their own equality, so equal values hit and distinct objects that merely
+    # print alike do not. Unhashable ones (lists, plain dicts inside tuples, ...) compare by type and repr.
     def __init__(self, *args, **kwargs) -> None:
+        kwargs.pop("use_cache", None)
         self.args = args
         self.kwargs = kwargs
-        kwargs.pop("use_cache", None)
+        self._key = self._normalize(args) + self._normalize(kwargs)
+        self._hash = hash(self._key)
+
+    @classmethod
+    def _normalize(cls, param: Any) -> Any:
+        if isinstance(param, tuple):
+            return tuple(map(cls._normalize, param))
+        if isinstance(param, dict):
+            return tuple(map(cls._normalize, param.items()))
+        try:
+            hash(param)
+        except TypeError:
+            return type(param), str(vars(param)) if hasattr(param, "__dict__") else repr(param)
+        return param
 
     def __hash__(self) -> int:
-        def _hash(param: Any) -> Any:
-            if isinstance(param, tuple):
-                return tuple(map(_hash, param))
-            if isinstance(param, dict):
-                return tuple(map(_hash, param.items()))
-            elif hasattr(param, "__dict__"):
-                return str(vars(param))
-            else:
-                return str(param)
-
-        return hash(_hash(self.args) + _hash(self.kwargs))
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Key) and self._key == other._key
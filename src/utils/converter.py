@@ -34,6 +34,9 @@ class MaybeMember(Converter["MaybeMember"]):
 
     """A custom Member converter that allows for partial matches.
 
+    Partial matches are resolved from the bot's local :class:`MemberIndex` first,
+    and only fall back to a gateway member query when the index has no match.
+
     This inherits from :class:`discord.ext.commands.Converter` and overrides
     the :meth:`discord.ext.commands.Converter.convert` method.
 
@@ -71,8 +74,15 @@ class MaybeMember(Converter["MaybeMember"]):
         try:
             member = await commands.MemberConverter().convert(ctx, argument)
         except commands.errors.MemberNotFound:
-            members = await ctx.guild.query_members(query=argument, limit=1)
-            member = members[0] if members else None
+            member = None
+            if (index := getattr(ctx.bot, "member_index", None)) is not None and ctx.guild is not None:
+                members = index.search(ctx.guild, argument, limit=1)
+                member = members[0] if members else None
+
+            if member is None:
+                logger.debug("Member index missed, querying the gateway: %s", argument)
+                members = await ctx.guild.query_members(query=argument, limit=1)
+                member = members[0] if members else None
         if member is None:
             logger.debug("Member not found: %s", argument)
             raise commands.errors.MemberNotFound(argument)
@@ -19,10 +19,13 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+import math
+import array
 import asyncio
 
 from typing import (
     List,
+    Dict,
     Any,
     Optional,
     Awaitable,
@@ -30,14 +33,17 @@ from typing import (
     Iterator,
     Mapping,
     MutableMapping,
+    Union,
 )
 from collections.abc import MutableSequence
+
+import discord
 from discord.utils import maybe_coroutine
 
 V = TypeVar("V")
 K = TypeVar("K", bound=str)
 
-__all__ = ('MaxSizeList', 'InsensitiveMapping', 'PartialCall')
+__all__ = ('MaxSizeList', 'InsensitiveMapping', 'PartialCall', 'Histogram', 'StatusStore')
 
 
 class PartialCall(List[Any]):
@@ -106,3 +112,185 @@ class InsensitiveMapping(dict):
             self[key] = value
         for key, value in kwargs.items():
             self[key] = value
+
+
+class Histogram:
+    """A compact, fixed-bucket histogram of durations in seconds.
+
+    Buckets are log-scaled from 10 microseconds upwards, four per doubling, so
+    percentiles are accurate to roughly 19% while the whole histogram stays a
+    single array of 96 counters regardless of how many values were recorded.
+
+    Examples
+    --------
+    >>> histogram = Histogram()
+    ... histogram.record(0.012)
+    ... histogram.percentile(99)
+    """
+
+    __slots__ = ("_counts", "count", "total", "max")
+
+    LOWEST: float = 1e-5
+    STEPS_PER_DOUBLING: int = 4
+    BUCKETS: int = 96
+
+    def __init__(self) -> None:
+        self._counts: array.array[int] = array.array("Q", bytes(8 * self.BUCKETS))
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} count={self.count} p50={self.percentile(50):.6f} max={self.max:.6f}>"
+
+    @classmethod
+    def upper_bound(cls, index: int) -> float:
+        return cls.LOWEST * 2 ** (index / cls.STEPS_PER_DOUBLING)
+
+    def record(self, value: float) -> None:
+        if value <= self.LOWEST:
+            index = 0
+        else:
+            index = min(int(math.log2(value / self.LOWEST) * self.STEPS_PER_DOUBLING) + 1, self.BUCKETS - 1)
+
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in enumerate(other._counts):
+            self._counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> float:
+        if not self.count:
+            return 0.0
+
+        rank, cumulative = percentile / 100 * self.count, 0
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                return min(self.upper_bound(index), self.max)
+
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class StatusStore:
+    """The last known status of every user, at about nine bytes a slot.
+
+    An open-addressing hash table over an array of snowflakes and a bytearray
+    of status codes, in place of full presence objects. Offline users are not
+    stored at all, since that is the status of anyone missing from the table.
+
+    Examples
+    --------
+    >>> statuses = StatusStore()
+    ... before = statuses.set(user_id, discord.Status.idle)
+    ... statuses.get(user_id)
+    <Status.idle: 'idle'>
+    """
+
+    __slots__ = ("_keys", "_values", "_mask", "_size")
+
+    # Code 0 is offline, which also covers invisible and unknown statuses.
+    STATUSES = (discord.Status.offline, discord.Status.online, discord.Status.idle, discord.Status.dnd)
+    CODES: Dict[str, int] = {"online": 1, "idle": 2, "dnd": 3}
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._allocate(1 << max(capacity - 1, 1).bit_length())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, user_id: int) -> bool:
+        return self._keys[self._find(user_id)] == user_id
+
+    @property
+    def nbytes(self) -> int:
+        return self._keys.itemsize * len(self._keys) + len(self._values)
+
+    def _allocate(self, capacity: int) -> None:
+        self._keys: array.array[int] = array.array("Q", bytes(8 * capacity))
+        self._values: bytearray = bytearray(capacity)
+        self._mask: int = capacity - 1
+        self._size: int = 0
+
+    def _home(self, user_id: int) -> int:
+        # Fibonacci hashing; the low bits of a snowflake are a per-process counter and cluster badly.
+        return ((user_id * 0x9E3779B97F4A7C15) >> 24) & self._mask
+
+    def _find(self, user_id: int) -> int:
+        # Snowflakes are never 0, so 0 marks an empty slot.
+        keys, mask = self._keys, self._mask
+        index = self._home(user_id)
+        while keys[index] and keys[index] != user_id:
+            index = (index + 1) & mask
+        return index
+
+    def get(self, user_id: int) -> discord.Status:
+        index = self._find(user_id)
+        return self.STATUSES[self._values[index]] if self._keys[index] else discord.Status.offline
+
+    def set(self, user_id: int, status: Union[discord.Status, str]) -> discord.Status:
+        """Stores a status and returns the previous one."""
+        code = self.CODES.get(str(status), 0)
+        index = self._find(user_id)
+        if not self._keys[index]:
+            if code:
+                self._keys[index], self._values[index] = user_id, code
+                self._size += 1
+                if self._size * 3 > len(self._keys) * 2:
+                    self._resize(len(self._keys) * 2)
+            return discord.Status.offline
+
+        previous = self.STATUSES[self._values[index]]
+        if code:
+            self._values[index] = code
+        else:
+            self._remove(index)
+        return previous
+
+    def _remove(self, index: int) -> None:
+        # Backward-shift deletion: pull later entries of the probe run into the hole, so lookups need no tombstones.
+        keys, values, mask = self._keys, self._values, self._mask
+        keys[index] = 0
+        self._size -= 1
+        following = index
+        while True:
+            following = (following + 1) & mask
+            if not (key := keys[following]):
+                return
+            home = self._home(key)
+            if (following - home) & mask >= (following - index) & mask:
+                keys[index], values[index] = key, values[following]
+                keys[following] = 0
+                index = following
+
+    def _resize(self, capacity: int) -> None:
+        entries = [(key, code) for key, code in zip(self._keys, self._values) if key]
+        self._allocate(capacity)
+        for key, code in entries:
+            index = self._find(key)
+            self._keys[index], self._values[index] = key, code
+        self._size = len(entries)
+
+    def clear(self) -> None:
+        self._allocate(len(self._keys))
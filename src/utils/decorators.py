@@ -19,10 +19,8 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-import asyncio
 import functools
 
-from concurrent.futures import ThreadPoolExecutor
 from typing import (
     Awaitable,
     Callable,
@@ -33,25 +31,35 @@ from typing import (
 )
 
 from discord.app_commands import Command as AppCommand
-from discord.ext.commands import Command as ExtCommand
+from discord.ext.commands import Command as ExtCommand, Context
+
+from .executors import get_pool
 
 T = TypeVar("T")
 P = ParamSpec("P")
-executor = ThreadPoolExecutor()
 
 
 __all__ = (
     "make_async",
     "for_all_callbacks",
+    "instrumented",
 )
 
 
-def make_async(func: Callable[P, T]) -> Callable[P, Awaitable[T]]:
-    """Decorator to wrap a function in a coroutine."""
+def make_async(func: Callable[P, T], /, *, pool: str = "io") -> Callable[P, Awaitable[T]]:
+    """Decorator to wrap a function in a coroutine.
+
+    The function runs in the named :class:`ExecutorPool`: ``io`` (the default) for
+    short blocking calls, ``blocking`` for slow ones and ``cpu`` for CPU-bound work
+    such as Pillow or NumPy processing, which runs in worker processes. ``cpu``
+    pickles the function and its arguments, so call it as ``make_async(func, pool="cpu")``
+    on a module-level function rather than using it as a decorator.
+    """
+    executor_pool = get_pool(pool)
 
     @functools.wraps(func)
     async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-        return await asyncio.get_event_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+        return await executor_pool.run(func, *args, **kwargs)
 
     return wrapper
 
@@ -72,3 +80,46 @@ def for_all_callbacks(decorator: Any) -> Any:
         return cls
 
     return decorate
+
+
+def instrumented(command: T) -> T:
+    """
+    Decorator that attributes the time spent deciding whether a command may run,
+    its global checks, cog check, own checks and cooldown, to the "checks" stage of
+    the invocation's stage clock. Without it that time is counted as argument
+    conversion. :class:`RoboMoxie` applies it to every command it registers.
+
+    >>> bot.add_command(instrumented(command))
+    """
+
+    if not isinstance(command, ExtCommand) or getattr(command, "__instrumented__", False):
+        return command
+
+    can_run = command.can_run
+    prepare_cooldowns = command._prepare_cooldowns
+
+    def lap(ctx: Context[Any], stage: str) -> None:
+        # can_run is also used outside of an invocation, e.g. to filter the help command.
+        if ctx.command is command and (clock := getattr(ctx, "clock", None)) is not None:
+            clock.lap(stage)
+
+    @functools.wraps(can_run)
+    async def timed_can_run(ctx: Context[Any], /) -> bool:
+        try:
+            return await can_run(ctx)
+        finally:
+            lap(ctx, "checks")
+
+    @functools.wraps(prepare_cooldowns)
+    def timed_prepare_cooldowns(ctx: Context[Any]) -> None:
+        # With cooldown_after_parsing the arguments were converted since the checks.
+        lap(ctx, "conversion" if command.cooldown_after_parsing else "checks")
+        try:
+            prepare_cooldowns(ctx)
+        finally:
+            lap(ctx, "checks")
+
+    command.can_run = timed_can_run  # type: ignore
+    command._prepare_cooldowns = timed_prepare_cooldowns  # type: ignore
+    command.__instrumented__ = True  # type: ignore
+    return command
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+import logging
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Literal, Optional, TypeVar
+
+from src.base import PoolSaturated
+
+from .datastructures import Histogram
+from .processing import run_in_process, shutdown_process_pool
+
+__all__ = ("ExecutorPool", "pools", "get_pool", "shutdown_pools")
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ExecutorPool:
+    """A named executor with a concurrency limit and a bounded queue.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more may
+    wait for a worker. Once the queue is full, the ``reject`` policy raises
+    :exc:`PoolSaturated` straight away while the ``block`` policy makes the caller
+    wait for room, pushing back on whoever is producing the work. ``process``
+    pools run through :func:`run_in_process`.
+
+    Examples
+    --------
+    >>> pool = ExecutorPool("blocking", max_workers=4, max_queue=16, policy="reject")
+    ... await pool.run(time.sleep, 1)
+    ... pool.stats()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_workers: int,
+        max_queue: int,
+        policy: Literal["block", "reject"] = "block",
+        kind: Literal["thread", "process"] = "thread",
+    ) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.policy = policy
+        self.kind = kind
+
+        self.queued: int = 0
+        self.running: int = 0
+        self.completed: int = 0
+        self.rejected: int = 0
+        self.wait_time = Histogram()
+        self.run_time = Histogram()
+
+        self._admission = asyncio.Semaphore(max_workers + max_queue)
+        self._workers = asyncio.Semaphore(max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} name={self.name!r} running={self.running} queued={self.queued}>"
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=f"moxie-{self.name}")
+        return self._executor
+
+    @property
+    def saturated(self) -> bool:
+        return self._admission.locked()
+
+    async def run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        if self.policy == "reject" and self.saturated:
+            self.rejected += 1
+            logger.warning("Rejected %s, pool <%s> is saturated.", getattr(func, "__qualname__", func), self.name)
+            raise PoolSaturated(self.name)
+
+        submitted = time.perf_counter()
+        await self._admission.acquire()
+        self.queued += 1
+        try:
+            await self._workers.acquire()
+        except BaseException:
+            self._admission.release()
+            raise
+        finally:
+            self.queued -= 1
+
+        started = time.perf_counter()
+        self.wait_time.record(started - submitted)
+        self.running += 1
+        try:
+            if self.kind == "process":
+                work = asyncio.ensure_future(run_in_process(func, *args, **kwargs))
+            else:
+                loop = asyncio.get_running_loop()
+                work = loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._finish(started)
+            raise
+
+        # A cancelled caller stops waiting but the call keeps its worker until it actually returns.
+        work.add_done_callback(functools.partial(self._finish, started))
+        return await asyncio.shield(work)
+
+    def _finish(self, started: float, work: Optional[asyncio.Future[Any]] = None) -> None:
+        self.running -= 1
+        self.completed += 1
+        self.run_time.record(time.perf_counter() - started)
+        self._workers.release()
+        self._admission.release()
+        if work is not None and not work.cancelled():
+            # Retrieved here so a call nobody waits for anymore does not log its exception as unhandled.
+            work.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "policy": self.policy,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_time": self.wait_time.summary(),
+            "run_time": self.run_time.summary(),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pools: Dict[str, ExecutorPool] = {
+    # Short blocking calls: file access, small parses, ...
+    "io": ExecutorPool("io", max_workers=min(32, (os.cpu_count() or 1) + 4), max_queue=256),
+    # CPU-heavy image and math jobs, run in worker processes.
+    "cpu": ExecutorPool("cpu", max_workers=os.cpu_count() or 1, max_queue=64, kind="process"),
+    # Slow calls that must not starve the io pool. Rejects rather than piling up.
+    "blocking": ExecutorPool("blocking", max_workers=4, max_queue=16, policy="reject"),
+}
+
+
+def get_pool(name: str) -> ExecutorPool:
+    try:
+        return pools[name]
+    except KeyError:
+        raise KeyError(f"<{name}> is not a valid executor pool") from None
+
+
+def shutdown_pools() -> None:
+    for pool in pools.values():
+        pool.shutdown()
+    shutdown_process_pool()
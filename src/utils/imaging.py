@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import struct
+import asyncio
+
+from io import BytesIO
+from typing import TYPE_CHECKING, Optional, NamedTuple, Union
+
+from .decorators import make_async
+from .importing import lazy_import
+
+if TYPE_CHECKING:
+    from PIL import Image
+else:
+    # Sniffing headers needs no Pillow, only decoding does.
+    Image = lazy_import("PIL.Image")
+
+__all__ = ("ImageInfo", "ImageHandle", "sniff_image")
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class ImageInfo(NamedTuple):
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def _sniff_jpeg(data: Buffer) -> Optional[ImageInfo]:
+    # Walk the marker segments until a start-of-frame, skipping whole segments
+    # (EXIF, ICC profiles, ...) by their declared length.
+    position, size = 2, len(data)
+    while position + 9 <= size:
+        if data[position] != 0xFF:
+            return None
+
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack_from(">HH", data, position + 5)
+            return ImageInfo("JPEG", width, height)
+
+        (length,) = struct.unpack_from(">H", data, position + 2)
+        position += 2 + length
+
+    return None
+
+
+def _sniff_webp(data: Buffer) -> Optional[ImageInfo]:
+    chunk = bytes(data[12:16])
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack_from("<HH", data, 26)
+        return ImageInfo("WEBP", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L" and len(data) >= 25:
+        (bits,) = struct.unpack_from("<I", data, 21)
+        return ImageInfo("WEBP", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return ImageInfo("WEBP", width, height)
+    return None
+
+
+def sniff_image(data: Buffer) -> Optional[ImageInfo]:
+    """Reads the format and dimensions of an image from its header, without decoding it.
+
+    Supports PNG, GIF, JPEG, WEBP and BMP, which covers what Discord serves as
+    attachments and avatars. Returns :data:`None` for anything else.
+    """
+    header = bytes(data[:32])
+    if header.startswith(b"\x89PNG\r\n\x1a\n") and len(header) >= 24:
+        width, height = struct.unpack_from(">II", header, 16)
+        return ImageInfo("PNG", width, height)
+    if header[:6] in (b"GIF87a", b"GIF89a") and len(header) >= 10:
+        width, height = struct.unpack_from("<HH", header, 6)
+        return ImageInfo("GIF", width, height)
+    if header.startswith(b"\xff\xd8"):
+        return _sniff_jpeg(data)
+    if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+        return _sniff_webp(data)
+    if header.startswith(b"BM") and len(header) >= 26:
+        width, height = struct.unpack_from("<ii", header, 18)
+        return ImageInfo("BMP", width, abs(height))
+    return None
+
+
+class ImageHandle:
+    """A validated image buffer together with its sniffed metadata.
+
+    The image is only decoded when :meth:`decode` is first awaited, off the event
+    loop, and the decoded image is kept so that later consumers don't parse the
+    same bytes again. Treat it as read-only and ``copy()`` it before mutating.
+
+    Examples
+    --------
+    >>> handle = ctx.check_buffer(buffer)
+    ... handle.info.width, handle.info.height
+    ... image = await handle.decode()
+    """
+
+    __slots__ = ("buffer", "info", "_image", "_decoding")
+
+    def __init__(self, buffer: BytesIO, info: ImageInfo) -> None:
+        self.buffer = buffer
+        self.info = info
+        self._image: Optional[Image.Image] = None
+        self._decoding: Optional[asyncio.Future[Image.Image]] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} format={self.info.format} size={self.info.width}x{self.info.height}>"
+
+    @property
+    def decoded(self) -> bool:
+        return self._image is not None
+
+    @staticmethod
+    def _open(data: bytes) -> Image.Image:
+        image = Image.open(BytesIO(data))
+        image.load()
+        return image
+
+    async def decode(self) -> Image.Image:
+        if self._image is None:
+            if self._decoding is None:
+                self._decoding = asyncio.ensure_future(make_async(self._open)(self.buffer.getvalue()))
+            self._image = await asyncio.shield(self._decoding)
+
+        return self._image
@@ -19,13 +19,106 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+from __future__ import annotations
+
 import re
 import math
 import operator
+import functools
+
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union, NamedTuple
+
+from concurrent.futures.process import BrokenProcessPool
+
+from src.base import ExpressionTooExpensive, InvalidExpression
+
+from .async_utils import LruCache
+from .processing import run_sandboxed
+from .importing import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image, ImageDraw
+else:
+    # Only graphs, arrays and cubes need these; plain calculations never load them.
+    np = lazy_import("numpy")
+    Image = lazy_import("PIL.Image")
+    ImageDraw = lazy_import("PIL.ImageDraw")
+
+__all__ = ("Calculator", "Program", "Cost", "CostLimits", "render_graph", "Cube")
+
+TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d*)?|\.\d+)|([A-Za-z_]\w*)|(\S))")
+# Whitespace between two operands, which stripping whitespace for the cache key would merge into one.
+SEPARATED_OPERANDS = re.compile(r"[\w.]\s+[\w.]")
+
+# Opcodes of a compiled program.
+CONST, LOAD, BINARY = 0, 1, 2
+
+Instruction = Tuple[int, Any]
+
+
+def _truncated_division(left: float, right: float) -> int:
+    return math.trunc(left / right)
+
+
+def _vector_truncated_division(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    return np.trunc(np.true_divide(left, right))
+
+
+@functools.cache
+def vectorized() -> Dict[Callable[[Any, Any], Any], Callable[[Any, Any], np.ndarray]]:
+    """Maps every scalar operator function to its array counterpart, built on first use."""
+    return {
+        operator.add: np.add,
+        operator.sub: np.subtract,
+        operator.mul: np.multiply,
+        _truncated_division: _vector_truncated_division,
+        operator.pow: np.power,
+    }
+
+
+class Cost(NamedTuple):
+    """A static estimate of what evaluating a program takes.
+
+    ``magnitude`` is an upper bound on ``log10`` of the largest intermediate value
+    and ``tower`` the deepest nesting of exponentiations.
+    """
+
+    instructions: int
+    points: int
+    magnitude: float
+    tower: int
 
-from typing import Any, List, Union, NamedTuple
 
-__all__ = ("Calculator", "Cube")
+class CostLimits(NamedTuple):
+    """Programs over any ``max_*`` limit are rejected; those over an ``inline_*`` limit run sandboxed."""
+
+    max_instructions: int = 512
+    max_points: int = 1_000_000
+    max_magnitude: float = 308.0  # past this a float overflows anyway
+    max_tower: int = 3
+    inline_instructions: int = 64
+    inline_points: int = 10_000
+    cpu_time: float = 2.0
+
+
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _magnitude(values: Any) -> float:
+    if _is_scalar(values):
+        largest = abs(float(values))
+    else:
+        largest = float(np.max(np.abs(values))) if np.size(values) else 0.0
+    return math.log10(largest) if largest > 1.0 else 0.0
+
+
+def _evaluate(expression: str, variables: Dict[str, Any], vectorized: bool) -> Any:
+    """Evaluates in a sandbox worker, which has its own program cache."""
+    calculator = Calculator(expression)
+    return calculator.calculate_array(**variables) if vectorized else calculator.calculate(**variables)
 
 
 class OperatorInfo(NamedTuple):
@@ -33,11 +126,101 @@ class OperatorInfo(NamedTuple):
     associativity: str
 
 
+class Program(NamedTuple):
+    """An expression compiled to a flat RPN instruction list.
+
+    ``code`` holds ``(CONST, value)``, ``(LOAD, name)`` and ``(BINARY, function)``
+    instructions, so evaluating it is a single loop over a list with no parsing.
+    """
+
+    source: str
+    code: Tuple[Instruction, ...]
+    variables: FrozenSet[str]
+
+    def evaluate(self, variables: Dict[str, float]) -> Union[float, int]:
+        stack: List[Any] = []
+        push, pop = stack.append, stack.pop
+        for opcode, argument in self.code:
+            if opcode == CONST:
+                push(argument)
+            elif opcode == LOAD:
+                push(float(variables[argument]))
+            else:
+                right = float(pop())
+                push(argument(float(pop()), right))
+        return stack[0]
+
+    def estimate(self, variables: Dict[str, Any]) -> Cost:
+        """Bounds the cost of evaluating the program with ``variables`` without evaluating it.
+
+        Divisors are assumed to be at least one in magnitude, so this can only
+        underestimate expressions that divide by tiny constants.
+        """
+        stack: List[Tuple[float, int]] = []
+        for opcode, argument in self.code:
+            if opcode == CONST:
+                stack.append((_magnitude(argument), 0))
+            elif opcode == LOAD:
+                stack.append((_magnitude(variables[argument]), 0))
+            else:
+                (right, right_tower), (left, left_tower) = stack.pop(), stack.pop()
+                tower = max(left_tower, right_tower)
+                if argument is operator.pow:
+                    # log10(a ** b) = b * log10(a), with b bounded by 10 ** right.
+                    try:
+                        magnitude = left * 10.0**right if left else 0.0
+                    except OverflowError:
+                        magnitude = math.inf
+                    tower += 1
+                elif argument is operator.mul:
+                    magnitude = left + right
+                elif argument is _truncated_division:
+                    magnitude = left
+                else:
+                    magnitude = max(left, right) + math.log10(2)
+                stack.append((magnitude, tower))
+
+        points = max((1 if _is_scalar(value) else int(np.size(value)) for value in variables.values()), default=1)
+        magnitude = max((magnitude for magnitude, _ in stack), default=0.0)
+        return Cost(len(self.code), points, magnitude, stack[0][1] if stack else 0)
+
+    def evaluate_array(self, variables: Dict[str, Any]) -> np.ndarray:
+        """Evaluates the program over whole arrays at once, e.g. ``{"x": np.linspace(-10, 10, 1000)}``.
+
+        Variables broadcast against each other. Overflow and division by zero give
+        ``inf``/``nan`` entries instead of raising.
+        """
+        stack: List[Any] = []
+        push, pop = stack.append, stack.pop
+        functions = vectorized()
+        with np.errstate(all="ignore"):
+            for opcode, argument in self.code:
+                if opcode == CONST:
+                    push(argument)
+                elif opcode == LOAD:
+                    push(np.asarray(variables[argument], dtype=np.float64))
+                else:
+                    right = pop()
+                    push(functions[argument](pop(), right))
+            # A constant expression still yields one value per point.
+            shape = np.broadcast_shapes(*(np.shape(value) for value in variables.values()))
+            return np.broadcast_to(np.asarray(stack[0], dtype=np.float64), shape)
+
+
 class Calculator:
     """
     See comments at: https://gist.github.com/qt-haskell/a5464b224f6ffcafd4486022dc6e1e47
     Uses the shunting-yard algorithm to convert an infix expression to RPN.
     And uses reverse polish notation to evaluate the expression.
+
+    Expressions are compiled once into a :class:`Program` and kept in an LRU keyed
+    by their source without whitespace, so repeating an expression, or evaluating
+    it with different variables, skips tokenizing and parsing altogether.
+
+    Examples
+    --------
+    >>> Calculator("2 * (3 + x)").calculate(x=4)
+    14.0
     """
 
     _ops = {
@@ -49,117 +232,288 @@ class Calculator:
         '-': OperatorInfo(precedence=2, associativity='left'),
         ')': OperatorInfo(precedence=0, associativity='left'),
     }
+    _functions: Dict[str, Callable[[Any, Any], Any]] = {
+        '+': operator.add,
+        '-': operator.sub,
+        '*': operator.mul,
+        '/': _truncated_division,
+        '^': operator.pow,
+    }
+    _programs: LruCache = LruCache(512)
 
     def __init__(self, expression: str) -> None:
         self.expression = expression
 
     @staticmethod
-    def _tokenize(expression: str) -> List[Union[str, Any]]:
-        symbols = re.split(r'(\d+|\D)', expression)
-        spaced_expression = ' '.join(symbols)
-
-        tokens = spaced_expression.split()
-        token_values = []
-        for token in tokens:
-            if token in Calculator._ops:
-                token_values.append((token, Calculator._ops[token]))
-            else:
-                token_values.append(('num', token))
+    def _tokenize(expression: str) -> List[Tuple[str, Any]]:
+        token_values: List[Tuple[str, Any]] = []
+        for match in TOKEN.finditer(expression):
+            number, name, symbol = match.groups()
+            if number is not None:
+                token_values.append(('num', float(number)))
+            elif name is not None:
+                token_values.append(('var', name))
+            elif symbol in Calculator._ops:
+                token_values.append((symbol, Calculator._ops[symbol]))
+            elif symbol is not None:
+                raise InvalidExpression(expression, f"unexpected character {symbol!r}")
         return token_values
 
     @staticmethod
-    def _parse_expression(tokens: List[Union[str, Any]]) -> List[str]:
-        queue, stack = [], []
+    def _parse_expression(expression: str, tokens: List[Tuple[str, Any]]) -> List[Instruction]:
+        queue: List[Instruction] = []
+        stack: List[Tuple[str, int, str]] = []
         for token, value in tokens:
             if token == 'num':
-                queue.append(value)
-            elif token in Calculator._ops:
-                t1, p1, a1 = token, Calculator._ops[token].precedence, Calculator._ops[token].associativity
+                queue.append((CONST, value))
+            elif token == 'var':
+                queue.append((LOAD, value))
+            else:
+                t1, p1, a1 = token, value.precedence, value.associativity
                 while stack:
-                    t2, p2, a2 = stack[-1]
+                    t2, p2, _ = stack[-1]
                     if (a1 == 'left' and p1 <= p2) or (a1 == 'right' and p1 < p2):
-                        if t1 != ')':
-                            if t2 != '(':
-                                stack.pop()
-                                queue.append(t2)
-                            else:
-                                break
+                        if t2 != '(':
+                            stack.pop()
+                            queue.append((BINARY, t2))
                         else:
-                            if t2 != '(':
-                                stack.pop()
-                                queue.append(t2)
-                            else:
+                            if t1 == ')':
                                 stack.pop()
-                                break
+                            break
                     else:
                         break
+                else:
+                    if t1 == ')':
+                        raise InvalidExpression(expression, "unbalanced parentheses")
                 if t1 != ')':
                     stack.append((t1, p1, a1))
         while stack:
-            t2, _, _ = stack[-1]
-            stack.pop()
-            queue.append(t2)
+            t2, _, _ = stack.pop()
+            if t2 == '(':
+                raise InvalidExpression(expression, "unbalanced parentheses")
+            queue.append((BINARY, t2))
         return queue
 
-    @staticmethod
-    def _evaluate_rpn(tokens: List[str]) -> Union[float, int]:
-        stack = []
-        if len(tokens) == 1:
-            return float(tokens[0])
-
-        ops = {
-            '+': operator.add,
-            '-': operator.sub,
-            '*': operator.mul,
-            '/': operator.truediv,
-            '^': operator.pow,
-        }
-
-        for token in tokens:
-            if token not in ops:
-                stack.append(token)
-            else:
-                secondary_operand = float(stack.pop())
-                primary_operand = float(stack.pop())
-                temp = ops[token](primary_operand, secondary_operand)
+    @classmethod
+    def compile(cls, expression: str) -> Program:
+        """Returns the compiled program for ``expression``, from the cache when possible."""
+        if SEPARATED_OPERANDS.search(expression):
+            raise InvalidExpression(expression, "missing operator")
 
-                if token == '/':
-                    temp = math.trunc(temp)
+        source = "".join(expression.split())
+        if source in cls._programs:
+            return cls._programs[source]
 
-                stack.append(temp)
-        return stack.pop()
+        rpn = cls._parse_expression(expression, cls._tokenize(expression))
+        code: List[Instruction] = []
+        depth = 0
+        for opcode, argument in rpn:
+            if opcode == BINARY:
+                if depth < 2:
+                    raise InvalidExpression(expression, f"missing operand for {argument!r}")
+                code.append((BINARY, cls._functions[argument]))
+                depth -= 1
+            else:
+                code.append((opcode, argument))
+                depth += 1
+        if depth != 1:
+            raise InvalidExpression(expression, "missing operator" if depth else "empty expression")
 
-    def calculate(self) -> Union[float, int]:
-        tokens = self._tokenize(self.expression)
-        rpn = self._parse_expression(tokens)
-        result = str(self._evaluate_rpn(rpn))
+        program = cls._programs[source] = Program(
+            source, tuple(code), frozenset(argument for opcode, argument in code if opcode == LOAD)
+        )
+        return program
 
+    def calculate(self, **variables: float) -> Union[float, int]:
+        program = self.compile(self.expression)
+        if missing := program.variables - variables.keys():
+            raise InvalidExpression(self.expression, f"missing variables {', '.join(sorted(missing))}")
+
+        result = str(program.evaluate(variables))
         return int(result) if result.isdigit() else float(result)
 
+    async def evaluate(self, *, limits: CostLimits = CostLimits(), **variables: Any) -> Any:
+        """Evaluates the expression without ever blocking the event loop for long.
+
+        The cost is estimated statically first: expressions over ``limits`` raise
+        :exc:`ExpressionTooExpensive` straight away, cheap ones are evaluated inline,
+        and the rest run in a sandbox worker under a CPU time and memory limit.
+        Array variables evaluate vectorized, as with :meth:`calculate_array`.
+        """
+        program = self.compile(self.expression)
+        if missing := program.variables - variables.keys():
+            raise InvalidExpression(self.expression, f"missing variables {', '.join(sorted(missing))}")
+
+        cost = program.estimate(variables)
+        if cost.instructions > limits.max_instructions:
+            raise ExpressionTooExpensive(self.expression, f"{cost.instructions} operations")
+        if cost.points > limits.max_points:
+            raise ExpressionTooExpensive(self.expression, f"{cost.points} points")
+        if cost.tower > limits.max_tower:
+            raise ExpressionTooExpensive(self.expression, f"exponents nested {cost.tower} deep")
+        if cost.magnitude > limits.max_magnitude:
+            raise ExpressionTooExpensive(self.expression, "the result would overflow")
+
+        arrays = not all(_is_scalar(value) or np.ndim(value) == 0 for value in variables.values())
+        try:
+            if cost.instructions <= limits.inline_instructions and cost.points <= limits.inline_points:
+                return _evaluate(self.expression, variables, arrays)
+            return await run_sandboxed(_evaluate, self.expression, variables, arrays, cpu_time=limits.cpu_time)
+        except ZeroDivisionError:
+            raise InvalidExpression(self.expression, "division by zero") from None
+        except OverflowError:
+            raise ExpressionTooExpensive(self.expression, "the result would overflow") from None
+        except TimeoutError:
+            raise ExpressionTooExpensive(self.expression, "it ran out of CPU time") from None
+        except (MemoryError, BrokenProcessPool):
+            raise ExpressionTooExpensive(self.expression, "it ran out of memory") from None
+
+    def calculate_array(self, **variables: Any) -> np.ndarray:
+        """Like :meth:`calculate`, but every variable is an array and so is the result."""
+        program = self.compile(self.expression)
+        if missing := program.variables - variables.keys():
+            raise InvalidExpression(self.expression, f"missing variables {', '.join(sorted(missing))}")
+
+        return program.evaluate_array(variables)
+
     def __repr__(self) -> str:
         return f'Calculator({self.expression})'
 
 
+def render_graph(
+    expression: str,
+    *,
+    variable: str = "x",
+    start: float = -10.0,
+    stop: float = 10.0,
+    size: Tuple[int, int] = (800, 600),
+    colour: Tuple[int, int, int] = (88, 101, 242),
+) -> BytesIO:
+    """Plots ``expression`` over ``variable`` from ``start`` to ``stop`` and returns a PNG.
+
+    The expression is evaluated once over two points per pixel column, with the
+    calculator's truncating division. This is blocking; run it with
+    ``ctx.wrap(render_graph, expression, pool="cpu")``.
+    """
+    width, height = size
+    program = Calculator.compile(expression)
+    if unknown := program.variables - {variable}:
+        raise InvalidExpression(expression, f"unknown variables {', '.join(sorted(unknown))}")
+
+    xs = np.linspace(start, stop, width * 2)
+    ys = program.evaluate_array({variable: xs})
+    finite = np.isfinite(ys)
+
+    if finite.any():
+        # Percentiles keep a single asymptote from flattening the rest of the curve.
+        low, high = np.percentile(ys[finite], (1, 99))
+        if high - low < 1e-9:
+            low, high = low - 1.0, high + 1.0
+        padding = (high - low) * 0.05
+        low, high = low - padding, high + padding
+    else:
+        low, high = -1.0, 1.0
+
+    px = (xs - start) / (stop - start) * (width - 1)
+    py = (high - ys) / (high - low) * (height - 1)
+    visible = finite & (py > -height) & (py < 2 * height)
+
+    image = Image.new("RGB", size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    if start < 0 < stop:
+        axis = -start / (stop - start) * (width - 1)
+        draw.line([(axis, 0), (axis, height)], fill=(200, 200, 200))
+    if low < 0 < high:
+        axis = high / (high - low) * (height - 1)
+        draw.line([(0, axis), (width, axis)], fill=(200, 200, 200))
+
+    # Split the curve wherever it leaves the canvas or stops being finite, then draw each run.
+    edges = np.flatnonzero(np.diff(visible.astype(np.int8)))
+    bounds = np.concatenate(([0], edges + 1, [len(xs)]))
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        if visible[begin] and end - begin > 1:
+            draw.line(list(zip(px[begin:end].tolist(), py[begin:end].tolist())), fill=colour, width=2)
+
+    buffer = BytesIO()
+    image.save(buffer, "png")
+    buffer.seek(0)
+    return buffer
+
+
 class Cube:
-    def __init__(self, size: int):
+    """A square grid just large enough to hold ``size`` cells, backed by a NumPy array.
+
+    Fills, neighbour counts and rotations are array operations, so they cost the
+    same handful of NumPy calls whatever the grid size.
+
+    Examples
+    --------
+    >>> cube = Cube(10)  # a 4x4 grid
+    ... cube.fill(1, rows=slice(0, 2))
+    ... cube.neighbour_counts()
+    """
+
+    # Cell colours for :meth:`render`, indexed by cell value.
+    PALETTE = ((47, 49, 54), (88, 101, 242), (87, 242, 135), (254, 231, 92), (237, 66, 69))
+
+    def __init__(self, size: int, *, dtype: Any = "int64") -> None:
         self.size = size
+        self.grid: np.ndarray = np.zeros((self.get_grid_size(),) * 2, dtype=dtype)
 
     def get_grid_size(self) -> int:
-        for i in range(1, self.size):
-            if (i - 1) ** 2 < self.size <= i**2:
-                return i
-
-        return 2  # shouldn't happen
+        # The smallest side whose square holds ``size`` cells, and never less than 2.
+        return max(2, math.isqrt(max(self.size, 1) - 1) + 1)
 
     def get_grid(self) -> List[List[int]]:
-        grid = []
-        for i in range(self.get_grid_size()):
-            grid.append([])
-            for j in range(self.get_grid_size()):
-                grid[i].append(0)
-
-        return grid
+        return self.grid.tolist()
 
     def get_grid_center(self) -> tuple:
-        grid = self.get_grid()
-        return len(grid) // 2, len(grid) // 2
+        center = self.grid.shape[0] // 2
+        return center, center
+
+    def fill(self, value: int, *, rows: Union[slice, int] = slice(None), columns: Union[slice, int] = slice(None)) -> None:
+        self.grid[rows, columns] = value
+
+    def fill_where(self, mask: np.ndarray, value: int) -> None:
+        self.grid[mask] = value
+
+    def neighbours(self, row: int, column: int, *, diagonal: bool = True) -> np.ndarray:
+        """Returns the values around a cell, clipped at the edges, in row-major order."""
+        window = self.grid[max(row - 1, 0) : row + 2, max(column - 1, 0) : column + 2]
+        mask = np.ones(window.shape, dtype=bool)
+        mask[row - max(row - 1, 0), column - max(column - 1, 0)] = False
+        if not diagonal:
+            rows, columns = np.indices(window.shape)
+            mask &= (rows == row - max(row - 1, 0)) | (columns == column - max(column - 1, 0))
+        return window[mask]
+
+    def neighbour_counts(self, *, diagonal: bool = True) -> np.ndarray:
+        """Counts the non-zero neighbours of every cell at once."""
+        occupied = np.pad(self.grid != 0, 1).astype(np.int8)
+        side = self.grid.shape[0]
+        offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if diagonal:
+            offsets += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+        counts = np.zeros(self.grid.shape, dtype=np.int8)
+        for dy, dx in offsets:
+            counts += occupied[1 + dy : 1 + dy + side, 1 + dx : 1 + dx + side]
+        return counts
+
+    def rotate(self, turns: int = 1) -> None:
+        """Rotates the grid clockwise by ``turns`` quarter turns."""
+        self.grid = np.rot90(self.grid, -turns).copy()
+
+    def flip(self, *, horizontal: bool = True) -> None:
+        self.grid = np.fliplr(self.grid).copy() if horizontal else np.flipud(self.grid).copy()
+
+    def render(self, *, cell: int = 32, palette: Optional[Any] = None) -> BytesIO:
+        """Draws the grid as a PNG, ``cell`` pixels per cell. Values index into ``palette``, wrapping around."""
+        palette = np.asarray(self.PALETTE if palette is None else palette, dtype=np.uint8)
+        pixels = palette[self.grid % len(palette)]
+        pixels = pixels.repeat(cell, axis=0).repeat(cell, axis=1)
+
+        buffer = BytesIO()
+        Image.fromarray(pixels, "RGB").save(buffer, "png")
+        buffer.seek(0)
+        return buffer
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import time
+import contextlib
+import collections
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .datastructures import Histogram
+
+__all__ = ("StageClock", "CommandMetrics")
+
+
+class StageClock:
+    """Splits a single command invocation into named stages.
+
+    :meth:`lap` attributes the time since the previous lap to a stage, which is
+    how sequential stages (checks, conversion, callback) are measured without
+    having to wrap them. :meth:`stage` times a nested block, such as a send
+    inside the callback, without moving the lap mark.
+    """
+
+    __slots__ = ("started", "mark", "stages")
+
+    def __init__(self) -> None:
+        self.started = self.mark = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, elapsed: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.add(stage, now - self.mark)
+        self.mark = now
+
+    @contextlib.contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class CommandMetrics:
+    """Per-command latency histograms, one per stage, and error counts.
+
+    Examples
+    --------
+    >>> metrics = CommandMetrics()
+    ... metrics.record("ping", clock, failed=False)
+    ... metrics.slowest(stage="callback")
+    """
+
+    STAGES: Tuple[str, ...] = ("checks", "conversion", "callback", "send", "total")
+    DISPATCH_STAGES: Tuple[str, ...] = ("parse", "pre_dispatch", "invoke", "post_dispatch", "total")
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, Dict[str, Histogram]] = {}
+        self.dispatch: Dict[str, Histogram] = {stage: Histogram() for stage in self.DISPATCH_STAGES}
+        self.invocations: collections.Counter[str] = collections.Counter()
+        self.errors: collections.Counter[str] = collections.Counter()
+
+    def record(self, command: str, clock: StageClock, *, failed: bool) -> None:
+        if (timings := self.timings.get(command)) is None:
+            timings = self.timings[command] = {stage: Histogram() for stage in self.STAGES}
+
+        for stage, elapsed in clock.stages.items():
+            if stage in timings:
+                timings[stage].record(elapsed)
+        timings["total"].record(clock.elapsed)
+
+        self.invocations[command] += 1
+        if failed:
+            self.errors[command] += 1
+
+    def record_dispatch(self, clock: StageClock) -> None:
+        """Records one message's trip through :meth:`RoboMoxie.process_commands`, command or not."""
+        for stage, elapsed in clock.stages.items():
+            if stage in self.dispatch:
+                self.dispatch[stage].record(elapsed)
+        self.dispatch["total"].record(clock.elapsed)
+
+    def slowest(self, *, stage: str = "total", percentile: float = 99, limit: int = 10) -> List[Tuple[str, float]]:
+        ranked = [(command, timings[stage].percentile(percentile)) for command, timings in self.timings.items()]
+        return sorted(ranked, key=lambda item: item[1], reverse=True)[:limit]
+
+    def report(self, command: str) -> Dict[str, Any]:
+        timings = self.timings.get(command, {})
+        return {
+            "invocations": self.invocations[command],
+            "errors": self.errors[command],
+            "stages": {stage: histogram.summary() for stage, histogram in timings.items()},
+        }
+
+    def dispatch_report(self) -> Dict[str, Any]:
+        return {stage: histogram.summary() for stage, histogram in self.dispatch.items()}
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import enum
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .datastructures import Histogram
+from .ratelimit import MemoryBackend, RateLimit
+
+__all__ = ("Priority", "MessageScheduler")
+logger = logging.getLogger(__name__)
+
+Sender = Callable[[], Awaitable[Any]]
+
+
+class Priority(enum.IntEnum):
+    """Lower values are sent first."""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class _Job:
+    __slots__ = ("priority", "sequence", "send", "key", "future", "enqueued", "superseded")
+
+    def __init__(self, priority: Priority, sequence: int, send: Sender, key: Optional[Hashable]) -> None:
+        self.priority = priority
+        self.sequence = sequence
+        self.send = send
+        self.key = key
+        self.future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self.enqueued: float = time.perf_counter()
+        self.superseded: bool = False
+
+    def __lt__(self, other: _Job) -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class _Channel:
+    __slots__ = ("heap", "pending", "worker")
+
+    def __init__(self) -> None:
+        self.heap: List[_Job] = []
+        self.pending: Dict[Hashable, _Job] = {}
+        self.worker: Optional[asyncio.Task[None]] = None
+
+
+class MessageScheduler:
+    """Paces outgoing messages per channel, in priority order.
+
+    Every channel has its own queue, drained by a worker that spends at most
+    ``rate`` sends every ``per`` seconds (Discord's per-channel message bucket),
+    so bursts are spread out instead of running into 429s. Queued jobs run by
+    :class:`Priority`, then in submission order. Jobs scheduled with the same
+    ``coalesce`` key replace one another while still queued, e.g. successive
+    edits of one message, and every caller gets the result of the one that is
+    sent. Time spent queued is recorded per priority.
+
+    Examples
+    --------
+    >>> message = await bot.outbox.schedule(
+    ...     channel.id, functools.partial(channel.send, "hello"), priority=Priority.BACKGROUND
+    ... )
+    """
+
+    def __init__(self, *, rate: int = 5, per: float = 5.0) -> None:
+        self.limit = RateLimit(rate, per)
+        self.sent: int = 0
+        self.coalesced: int = 0
+        self.queue_time: Dict[Priority, Histogram] = {priority: Histogram() for priority in Priority}
+
+        self._pacer = MemoryBackend(maxsize=4096)
+        self._channels: Dict[int, _Channel] = {}
+        self._sequence = itertools.count()
+        # Callers waiting on each job's future; coalesced jobs share one.
+        self._waiters: Dict[asyncio.Future[Any], int] = {}
+
+    def __len__(self) -> int:
+        return sum(len(channel.heap) for channel in self._channels.values())
+
+    async def schedule(
+        self,
+        channel_id: int,
+        send: Sender,
+        *,
+        priority: Priority = Priority.NORMAL,
+        coalesce: Optional[Hashable] = None,
+    ) -> Any:
+        """Queues ``send`` for ``channel_id`` and returns its result once it ran."""
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self._channels[channel_id] = _Channel()
+
+        job = _Job(priority, next(self._sequence), send, coalesce)
+        if coalesce is not None and (previous := channel.pending.get(coalesce)) is not None:
+            previous.superseded = True
+            job.priority = min(job.priority, previous.priority)
+            job.future = previous.future
+            self.coalesced += 1
+        if coalesce is not None:
+            channel.pending[coalesce] = job
+
+        heapq.heappush(channel.heap, job)
+        if channel.worker is None:
+            channel.worker = asyncio.create_task(self._drain(channel_id, channel))
+
+        future = job.future
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # Shielded so one cancelled caller does not cancel the send others coalesced into.
+            return await asyncio.shield(future)
+        finally:
+            if remaining := self._waiters.pop(future) - 1:
+                self._waiters[future] = remaining
+            elif not future.done():
+                # Nobody waits for the result anymore, so the queued send is dropped.
+                future.cancel()
+
+    async def _drain(self, channel_id: int, channel: _Channel) -> None:
+        key = str(channel_id)
+        try:
+            while channel.heap:
+                # Dead jobs are dropped before pacing so they never spend a send.
+                if (job := channel.heap[0]).superseded or job.future.done():
+                    self._pop(channel)
+                    continue
+
+                result = self._pacer.hit_nowait(key, self.limit)
+                if result.limited:
+                    await asyncio.sleep(result.retry_after)
+                    continue
+
+                if (job := self._pop(channel)).future.done():
+                    continue
+
+                self.queue_time[job.priority].record(time.perf_counter() - job.enqueued)
+                try:
+                    sent = await job.send()
+                except Exception as exc:
+                    if not job.future.done():
+                        job.future.set_exception(exc)
+                else:
+                    if not job.future.done():
+                        job.future.set_result(sent)
+                finally:
+                    self.sent += 1
+        finally:
+            channel.worker = None
+            if not channel.heap:
+                self._channels.pop(channel_id, None)
+
+    @staticmethod
+    def _pop(channel: _Channel) -> _Job:
+        job = heapq.heappop(channel.heap)
+        if job.key is not None and channel.pending.get(job.key) is job:
+            del channel.pending[job.key]
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self._channels),
+            "queued": len(self),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "queue_time": {priority.name.lower(): histogram.summary() for priority, histogram in self.queue_time.items()},
+        }
+
+    def busiest(self, count: int = 5) -> List[Tuple[int, int]]:
+        return heapq.nlargest(
+            count,
+            ((channel_id, len(channel.heap)) for channel_id, channel in self._channels.items()),
+            key=lambda item: item[1],
+        )
+
+    def close(self) -> None:
+        for channel in self._channels.values():
+            if channel.worker is not None:
+                channel.worker.cancel()
+            for job in channel.heap:
+                job.future.cancel()
+        self._channels.clear()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import os
+import math
+import signal
+import asyncio
+import functools
+import multiprocessing
+
+from io import BytesIO
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the sandbox then only isolates.
+    resource = None
+
+__all__ = (
+    "SharedBuffer",
+    "run_in_process",
+    "run_sandboxed",
+    "get_process_pool",
+    "get_sandbox_pool",
+    "shutdown_process_pool",
+)
+
+T = TypeVar("T")
+
+SHARE_THRESHOLD: int = 64 * 1024  # smaller payloads are cheaper to pickle than to map
+SANDBOX_MEMORY: int = 512 * 1024 * 1024  # address space a sandbox worker may grow by
+_process_pool: Optional[ProcessPoolExecutor] = None
+_sandbox_pool: Optional[ProcessPoolExecutor] = None
+
+
+class SharedBuffer(NamedTuple):
+    """A picklable reference to bytes living in a shared memory segment."""
+
+    name: str
+    size: int
+    stream: bool
+
+    @classmethod
+    def share(cls, value: Any, segments: List[SharedMemory]) -> Any:
+        """Moves large byte payloads into shared memory, leaving anything else untouched."""
+        if isinstance(value, BytesIO):
+            view, stream = value.getbuffer(), True
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            view, stream = memoryview(value), False
+        else:
+            return value
+
+        with view:
+            if view.nbytes < SHARE_THRESHOLD:
+                return value
+
+            segment = SharedMemory(create=True, size=view.nbytes)
+            segment.buf[: view.nbytes] = view.cast("B")
+            segments.append(segment)
+            return cls(segment.name, view.nbytes, stream)
+
+    def load(self, *, unlink: bool = False) -> Any:
+        segment = SharedMemory(name=self.name)
+        try:
+            data = bytes(segment.buf[: self.size])
+        finally:
+            segment.close()
+            if unlink:
+                segment.unlink()
+
+        return BytesIO(data) if self.stream else data
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Returns the lazily created process pool used for CPU-bound work."""
+    global _process_pool
+    if _process_pool is None:
+        # Spawned rather than forked: forking a process with a running event loop
+        # and live sockets hands the children state they must never touch.
+        context = multiprocessing.get_context("spawn")
+        _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context)
+    return _process_pool
+
+
+def get_sandbox_pool() -> ProcessPoolExecutor:
+    """Returns the process pool for untrusted workloads, whose workers run under resource limits."""
+    global _sandbox_pool
+    if _sandbox_pool is None:
+        context = multiprocessing.get_context("spawn")
+        _sandbox_pool = ProcessPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 1),
+            mp_context=context,
+            initializer=_limit_worker,
+            initargs=(SANDBOX_MEMORY,),
+            max_tasks_per_child=64,
+        )
+    return _sandbox_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool, _sandbox_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _sandbox_pool is not None:
+        _sandbox_pool.shutdown(wait=False, cancel_futures=True)
+        _sandbox_pool = None
+
+
+def _address_space() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _cpu_time_exceeded(*_: Any) -> None:
+    raise TimeoutError("CPU time limit exceeded")
+
+
+def _limit_worker(memory: int) -> None:
+    """Runs once in every sandbox worker: caps how far its address space may grow."""
+    if resource is None:
+        return
+
+    signal.signal(signal.SIGXCPU, _cpu_time_exceeded)
+    try:
+        limit = _address_space() + memory
+    except (OSError, ValueError):
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _invoke_limited(cpu_time: float, func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    """Runs in a sandbox worker with its CPU time capped at ``cpu_time`` more seconds (rounded up)."""
+    if resource is None:
+        return func(*args, **kwargs)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    # RLIMIT_CPU counts the worker's whole lifetime, so the budget is added to what it used so far.
+    limit = math.ceil(usage.ru_utime + usage.ru_stime + cpu_time)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit if hard == resource.RLIM_INFINITY else min(limit, hard), hard))
+    try:
+        return func(*args, **kwargs)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+async def run_sandboxed(func: Callable[..., T], /, *args: Any, cpu_time: float = 2.0, **kwargs: Any) -> T:
+    """Runs ``func`` in the sandbox pool, under a CPU time and memory limit.
+
+    Exceeding the CPU time raises :exc:`TimeoutError` and exceeding the memory
+    limit raises :exc:`MemoryError`, both from inside the worker, which survives.
+    A worker that dies anyway is replaced and :exc:`BrokenProcessPool` is raised.
+    """
+    global _sandbox_pool
+    pool = get_sandbox_pool()
+    try:
+        return await asyncio.wrap_future(pool.submit(_invoke_limited, cpu_time, func, args, kwargs))
+    except BrokenProcessPool:
+        if _sandbox_pool is pool:
+            _sandbox_pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+
+def _invoke(func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    """Runs in the worker: materialises shared arguments and shares a large result back."""
+    args = tuple(arg.load() if isinstance(arg, SharedBuffer) else arg for arg in args)
+    kwargs = {key: value.load() if isinstance(value, SharedBuffer) else value for key, value in kwargs.items()}
+    segments: List[SharedMemory] = []
+    result = SharedBuffer.share(func(*args, **kwargs), segments)
+
+    # The parent unlinks the segment once it has read it.
+    for segment in segments:
+        segment.close()
+    return result
+
+
+def _release(segments: List[SharedMemory], _: Future[Any]) -> None:
+    for segment in segments:
+        segment.close()
+        segment.unlink()
+
+
+def _discard(future: Future[Any]) -> None:
+    if not future.cancelled() and future.exception() is None and isinstance(result := future.result(), SharedBuffer):
+        result.load(unlink=True)
+
+
+async def run_in_process(func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Runs ``func`` in the process pool.
+
+    Byte payloads (``bytes``, ``bytearray``, ``memoryview`` and ``BytesIO``) over
+    64 KiB are passed through :mod:`multiprocessing.shared_memory` in both
+    directions instead of being pickled through the pool's pipe. ``func`` must
+    be importable at module level.
+    """
+    segments: List[SharedMemory] = []
+    try:
+        shared_args = tuple(SharedBuffer.share(arg, segments) for arg in args)
+        shared_kwargs = {key: SharedBuffer.share(value, segments) for key, value in kwargs.items()}
+        future = get_process_pool().submit(_invoke, func, shared_args, shared_kwargs)
+    except BaseException:
+        _release(segments, None)  # type: ignore
+        raise
+
+    # Inputs are released once the worker is done with them, even if we stop waiting.
+    future.add_done_callback(functools.partial(_release, segments))
+    try:
+        result = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_discard)
+        raise
+
+    return result.load(unlink=True) if isinstance(result, SharedBuffer) else result
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+import datetime
+import collections
+
+from typing import Any, Awaitable, Callable, Coroutine, Deque, Dict, Generator, List, NamedTuple, Optional, TypeVar
+
+from .datastructures import Histogram
+
+__all__ = ("LoopProfiler", "SlowCallback")
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SlowCallback(NamedTuple):
+    name: str
+    kind: str
+    cog: Optional[str]
+    blocked: float
+    elapsed: float
+    at: datetime.datetime
+
+
+class CallbackStats:
+    """Per-callback histograms of the longest blocking step and of the total run time."""
+
+    __slots__ = ("kind", "cog", "blocking", "elapsed")
+
+    def __init__(self, kind: str, cog: Optional[str]) -> None:
+        self.kind = kind
+        self.cog = cog
+        self.blocking = Histogram()
+        self.elapsed = Histogram()
+
+
+class _Measured(Awaitable[T]):
+    """Drives a coroutine step by step, timing how long each step holds the loop."""
+
+    __slots__ = ("_coro", "_done")
+
+    def __init__(self, coro: Coroutine[Any, Any, T], done: Callable[[float, float], None]) -> None:
+        self._coro = coro
+        self._done = done
+
+    def __await__(self) -> Generator[Any, Any, T]:
+        coro, value, error = self._coro, None, None
+        started = time.perf_counter()
+        longest = 0.0
+
+        while True:
+            step = time.perf_counter()
+            try:
+                yielded = coro.send(value) if error is None else coro.throw(error)
+            except StopIteration as exc:
+                self._done(max(longest, time.perf_counter() - step), time.perf_counter() - started)
+                return exc.value
+            except BaseException:
+                self._done(max(longest, time.perf_counter() - step), time.perf_counter() - started)
+                raise
+
+            longest = max(longest, time.perf_counter() - step)
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exc:
+                value, error = None, exc
+
+
+class LoopProfiler:
+    """Watches the event loop for lag and attributes blocking time to callbacks.
+
+    A background task measures how late the loop wakes up from a fixed sleep,
+    which is the lag every other coroutine is currently experiencing. Listeners
+    and commands run through :meth:`measure` have each of their steps timed; a
+    step is the time between two awaits, i.e. the time the callback held the loop.
+    Callbacks whose longest step exceeds ``threshold`` are kept in a ring buffer.
+
+    Examples
+    --------
+    >>> profiler = LoopProfiler(threshold=0.05)
+    ... profiler.start()
+    ... await profiler.measure(coro, name="on_message", kind="listener")
+    ... profiler.report()
+    """
+
+    def __init__(self, *, interval: float = 0.5, threshold: float = 0.1, history: int = 128) -> None:
+        self.interval = interval
+        self.threshold = threshold
+
+        self.lag = Histogram()
+        self.stats: Dict[str, CallbackStats] = {}
+        self.offenders: Deque[SlowCallback] = collections.deque(maxlen=history)
+
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._monitor(), name="moxie: loop profiler")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _monitor(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.lag.record(lag)
+            if lag > self.threshold:
+                logger.warning("Event loop lagged %.3fs behind.", lag)
+
+    def measure(self, coro: Coroutine[Any, Any, T], *, name: str, kind: str, cog: Optional[str] = None) -> Awaitable[T]:
+        def done(blocked: float, elapsed: float) -> None:
+            if (stats := self.stats.get(name)) is None:
+                stats = self.stats[name] = CallbackStats(kind, cog)
+
+            stats.blocking.record(blocked)
+            stats.elapsed.record(elapsed)
+            if blocked > self.threshold:
+                now = datetime.datetime.now(tz=datetime.timezone.utc)
+                self.offenders.append(SlowCallback(name, kind, cog, blocked, elapsed, now))
+                logger.warning("%s %s blocked the event loop for %.3fs.", kind.capitalize(), name, blocked)
+
+        return _Measured(coro, done)
+
+    def wrap(
+        self, func: Callable[..., Coroutine[Any, Any, T]], *, name: str, kind: str, cog: Optional[str] = None
+    ) -> Callable[..., Awaitable[T]]:
+        def wrapper(*args: Any, **kwargs: Any) -> Awaitable[T]:
+            return self.measure(func(*args, **kwargs), name=name, kind=kind, cog=cog)
+
+        return wrapper
+
+    def slowest(self, *, limit: int = 10, percentile: float = 99) -> List[tuple[str, CallbackStats]]:
+        ranked = sorted(self.stats.items(), key=lambda item: item[1].blocking.percentile(percentile), reverse=True)
+        return ranked[:limit]
+
+    def report(self, *, limit: int = 10) -> Dict[str, Any]:
+        return {
+            "lag": self.lag.summary(),
+            "slowest": {
+                name: {
+                    "kind": stats.kind,
+                    "cog": stats.cog,
+                    "blocking": stats.blocking.summary(),
+                    "elapsed": stats.elapsed.summary(),
+                }
+                for name, stats in self.slowest(limit=limit)
+            },
+            "offenders": [offender._asdict() for offender in reversed(self.offenders)],
+        }
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import time
+import inspect
+import logging
+import functools
+
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Hashable, NamedTuple, Optional, Protocol, TypeVar, Union
+
+from discord.ext import commands
+
+from .async_utils import LruCache
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+__all__ = (
+    "RateLimit",
+    "RateLimitResult",
+    "MemoryBackend",
+    "RedisBackend",
+    "RateLimiter",
+    "rate_limit",
+    "limit_listener",
+)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+KeyFunction = Callable[..., Hashable]
+
+
+class RateLimit(NamedTuple):
+    """Allows ``rate`` hits every ``per`` seconds, all of which may be spent in a burst."""
+
+    rate: int
+    per: float
+
+    @property
+    def emission_interval(self) -> float:
+        return self.per / self.rate
+
+
+class RateLimitResult(NamedTuple):
+    limited: bool
+    retry_after: float
+    remaining: int
+
+
+class Backend(Protocol):
+    async def hit(self, key: str, limit: RateLimit, cost: int = 1) -> RateLimitResult: ...
+
+
+class MemoryBackend:
+    """In-process GCRA backend.
+
+    Only the theoretical arrival time of each key is stored, in an LRU bounded by
+    ``maxsize``. Keys whose arrival time has passed carry no state and are pruned
+    on write, so memory stays proportional to the keys that are actually limited.
+    """
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        self._arrivals: LruCache = LruCache(maxsize)
+        self._pruned_at: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self._arrivals)
+
+    async def hit(self, key: str, limit: RateLimit, cost: int = 1) -> RateLimitResult:
+        return self.hit_nowait(key, limit, cost)
+
+    def hit_nowait(self, key: str, limit: RateLimit, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        arrival = max(self._arrivals[key] if key in self._arrivals else now, now)
+
+        new_arrival = arrival + limit.emission_interval * cost
+        allow_at = new_arrival - limit.per
+        if allow_at > now:
+            return RateLimitResult(True, allow_at - now, 0)
+
+        self._arrivals[key] = new_arrival
+        if len(self._arrivals) == self._arrivals.maxsize and now - self._pruned_at > 1.0:
+            self.prune(now)
+
+        return RateLimitResult(False, 0.0, int((limit.per - (new_arrival - now)) / limit.emission_interval))
+
+    def prune(self, now: Optional[float] = None) -> None:
+        now = self._pruned_at = time.monotonic() if now is None else now
+        for key in [key for key, arrival in self._arrivals.items() if arrival <= now]:
+            del self._arrivals[key]
+
+
+class RedisBackend:
+    """GCRA backend shared between processes through Redis.
+
+    The check-and-set runs as a single Lua script against the server clock, so
+    every process sees the same buckets. Keys expire on their own once idle.
+    """
+
+    SCRIPT = """
+    local emission = tonumber(ARGV[1])
+    local period = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+
+    local clock = redis.call('TIME')
+    local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+    local arrival = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+
+    local new_arrival = arrival + emission * cost
+    local allow_at = new_arrival - period
+    if allow_at > now then
+        return {1, allow_at - now, 0}
+    end
+
+    redis.call('SET', KEYS[1], new_arrival, 'PX', math.max(new_arrival - now, 1))
+    return {0, 0, math.floor((period - (new_arrival - now)) / emission)}
+    """
+
+    def __init__(self, redis: Redis, *, namespace: str = "moxie:ratelimit") -> None:
+        self.namespace = namespace
+        self._script = redis.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, limit: RateLimit, cost: int = 1) -> RateLimitResult:
+        limited, retry_after, remaining = await self._script(
+            keys=[f"{self.namespace}:{key}"],
+            args=[max(int(limit.emission_interval * 1000), 1), int(limit.per * 1000), cost],
+        )
+        return RateLimitResult(bool(limited), retry_after / 1000, remaining)
+
+
+class RateLimiter:
+    """A token-bucket style rate limiter using the generic cell rate algorithm.
+
+    Examples
+    --------
+    >>> limiter = RateLimiter(5, 10.0)  # 5 hits per 10 seconds
+    ... result = await limiter.hit(ctx.author.id)
+    ... if result.limited:
+    ...     await ctx.send(f"Try again in {result.retry_after:.1f}s")
+    """
+
+    def __init__(self, rate: int, per: float, *, backend: Optional[Backend] = None) -> None:
+        self.limit = RateLimit(rate, per)
+        self.backend: Backend = backend or MemoryBackend()
+
+    async def hit(self, key: Hashable, *, limit: Optional[RateLimit] = None, cost: int = 1) -> RateLimitResult:
+        """Records a hit for ``key``, or reports how long to wait if it is limited.
+
+        ``limit`` overrides the limiter's own limit for this hit only.
+        """
+        return await self.backend.hit(str(key), limit or self.limit, cost)
+
+
+def rate_limit(
+    rate: int,
+    per: float,
+    *,
+    key: Union[commands.BucketType, KeyFunction] = commands.BucketType.user,
+    backend: Optional[Backend] = None,
+) -> Callable[[T], T]:
+    """A command check that raises :exc:`commands.CommandOnCooldown` when limited.
+
+    ``key`` is either a :class:`commands.BucketType` or a callable taking the context.
+    Unlike the built-in cooldowns this can share its buckets between processes by
+    passing a :class:`RedisBackend`.
+    """
+    limiter = RateLimiter(rate, per, backend=backend)
+    bucket_type = key if isinstance(key, commands.BucketType) else commands.BucketType.default
+
+    async def predicate(ctx: commands.Context[Any]) -> bool:
+        bucket_key = key.get_key(ctx.message) if isinstance(key, commands.BucketType) else key(ctx)
+        result = await limiter.hit((ctx.command.qualified_name, bucket_key))
+        if result.limited:
+            raise commands.CommandOnCooldown(commands.Cooldown(rate, per), result.retry_after, bucket_type)
+        return True
+
+    return commands.check(predicate)
+
+
+def limit_listener(
+    rate: int,
+    per: float,
+    *,
+    key: KeyFunction,
+    backend: Optional[Backend] = None,
+) -> Callable[[Callable[..., Awaitable[None]]], Callable[..., Awaitable[None]]]:
+    """Drops listener invocations once ``key`` exceeds the limit.
+
+    ``key`` receives the event arguments (without the cog instance). Apply it
+    below :meth:`commands.Cog.listener`.
+    """
+    limiter = RateLimiter(rate, per, backend=backend)
+
+    def decorator(func: Callable[..., Awaitable[None]]) -> Callable[..., Awaitable[None]]:
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError("Listener must be a coroutine function.")
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> None:
+            event_args = args[1:] if args and isinstance(args[0], commands.Cog) else args
+            result = await limiter.hit(key(*event_args, **kwargs))
+            if result.limited:
+                logger.debug("Dropped %s, rate limited for %.2fs.", func.__qualname__, result.retry_after)
+                return
+
+            await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
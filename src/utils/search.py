@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import bisect
+import difflib
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+import discord
+
+__all__ = ("MemberIndex",)
+
+
+class _GuildIndex:
+    """Casefolded member names of a single guild."""
+
+    __slots__ = ("names", "lookup", "ordered")
+
+    def __init__(self) -> None:
+        self.names: Dict[int, Tuple[str, ...]] = {}
+        self.lookup: Dict[str, Set[int]] = {}
+        self.ordered: List[str] = []
+
+    def bulk(self, entries: Iterable[Tuple[int, Tuple[str, ...]]]) -> None:
+        for member_id, names in entries:
+            self.names[member_id] = names
+            for name in names:
+                self.lookup.setdefault(name, set()).add(member_id)
+
+        self.ordered = sorted(self.lookup)
+
+    def add(self, member_id: int, names: Tuple[str, ...]) -> None:
+        if self.names.get(member_id) == names:
+            return
+
+        self.remove(member_id)
+        self.names[member_id] = names
+        for name in names:
+            if name not in self.lookup:
+                self.lookup[name] = set()
+                bisect.insort(self.ordered, name)
+            self.lookup[name].add(member_id)
+
+    def remove(self, member_id: int) -> None:
+        for name in self.names.pop(member_id, ()):
+            member_ids = self.lookup[name]
+            member_ids.discard(member_id)
+            if not member_ids:
+                del self.lookup[name]
+                del self.ordered[bisect.bisect_left(self.ordered, name)]
+
+    def prefixed(self, prefix: str) -> Iterable[str]:
+        for position in range(bisect.bisect_left(self.ordered, prefix), len(self.ordered)):
+            name = self.ordered[position]
+            if not name.startswith(prefix):
+                break
+            yield name
+
+    def search(self, query: str, limit: int) -> List[int]:
+        found: Dict[int, None] = dict.fromkeys(self.lookup.get(query, ()))
+
+        for name in self.prefixed(query):
+            if len(found) >= limit:
+                break
+            found.update(dict.fromkeys(self.lookup[name]))
+
+        if not found:
+            # Fuzzy matching is restricted to names sharing the first character,
+            # which keeps it cheap on large guilds.
+            candidates = list(self.prefixed(query[:1]))
+            for name in difflib.get_close_matches(query, candidates, n=limit, cutoff=0.7):
+                found.update(dict.fromkeys(self.lookup[name]))
+
+        return list(found)[:limit]
+
+
+class MemberIndex:
+    """An in-process, per-guild index of member names.
+
+    Holds the casefolded username, nickname and global name of every member and
+    resolves exact, prefix and fuzzy queries locally, without a gateway round-trip.
+    A guild is indexed from its member cache the first time it is searched, and
+    is kept up to date from member events afterwards.
+
+    Examples
+    --------
+    >>> index = MemberIndex()
+    ... members = index.search(ctx.guild, "moxi")
+    """
+
+    def __init__(self) -> None:
+        self._guilds: Dict[int, _GuildIndex] = {}
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._guilds
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    @staticmethod
+    def names_of(member: discord.Member) -> Tuple[str, ...]:
+        names = (member.name, member.nick, getattr(member, "global_name", None))
+        return tuple(dict.fromkeys(name.casefold() for name in names if name))
+
+    def build(self, guild: discord.Guild) -> None:
+        index = _GuildIndex()
+        index.bulk((member.id, self.names_of(member)) for member in guild.members)
+        self._guilds[guild.id] = index
+
+    def drop(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
+
+    def add(self, member: discord.Member) -> None:
+        """Adds or refreshes a member. Guilds which were never searched are left alone."""
+        if (index := self._guilds.get(member.guild.id)) is not None:
+            index.add(member.id, self.names_of(member))
+
+    def remove(self, member: discord.Member) -> None:
+        if (index := self._guilds.get(member.guild.id)) is not None:
+            index.remove(member.id)
+
+    def search(self, guild: discord.Guild, query: str, *, limit: int = 1) -> List[discord.Member]:
+        if guild.id not in self._guilds:
+            self.build(guild)
+
+        members = (guild.get_member(member_id) for member_id in self._guilds[guild.id].search(query.casefold(), limit))
+        return [member for member in members if member is not None]
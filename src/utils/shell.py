@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import os
+import time
+import signal
+import asyncio
+import logging
+import contextlib
+
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+
+__all__ = ("ShellResult", "ShellRunner", "shell_runner")
+logger = logging.getLogger(__name__)
+
+OutputCallback = Callable[[str], Awaitable[None]]
+
+
+class ShellResult(NamedTuple):
+    stdout: str
+    stderr: str
+    returncode: Optional[int]
+    timed_out: bool
+    truncated: bool
+
+
+class _Capture:
+    """Collects a stream up to ``limit`` bytes and keeps draining it afterwards so the child never blocks."""
+
+    __slots__ = ("buffer", "limit", "truncated")
+
+    def __init__(self, limit: int) -> None:
+        self.buffer = bytearray()
+        self.limit = limit
+        self.truncated = False
+
+    async def drain(self, stream: asyncio.StreamReader, chunk_size: int = 4096) -> None:
+        while chunk := await stream.read(chunk_size):
+            room = self.limit - len(self.buffer)
+            if room > 0:
+                self.buffer += chunk[:room]
+            if len(chunk) > room:
+                self.truncated = True
+
+    def text(self) -> str:
+        return self.buffer.decode(errors="replace")
+
+
+class ShellRunner:
+    """Runs shell commands with a deadline, an output cap and a concurrency limit.
+
+    Output is read incrementally; each stream keeps at most ``max_output`` bytes
+    and anything past that is discarded. Commands run in their own session, so
+    when the deadline expires the whole process group is killed, not just the
+    shell. ``on_output`` is called with the output so far at most every
+    ``interval`` seconds, which is how :meth:`Context.shell` edits its message.
+
+    Examples
+    --------
+    >>> result = await shell_runner.run("git log --oneline", timeout=10)
+    ... print(result.stdout, result.timed_out)
+    """
+
+    def __init__(self, *, max_concurrency: int = 4, max_output: int = 64 * 1024, timeout: float = 30.0) -> None:
+        self.max_output = max_output
+        self.timeout = timeout
+
+        self.running: int = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(
+        self,
+        command: str,
+        *,
+        timeout: Optional[float] = None,
+        max_output: Optional[int] = None,
+        on_output: Optional[OutputCallback] = None,
+        interval: float = 1.0,
+    ) -> ShellResult:
+        timeout = self.timeout if timeout is None else timeout
+        stdout, stderr = _Capture(max_output or self.max_output), _Capture(max_output or self.max_output)
+
+        async with self._semaphore:
+            self.running += 1
+            process = await asyncio.create_subprocess_shell(
+                command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=os.name == "posix",
+            )
+            readers = asyncio.gather(stdout.drain(process.stdout), stderr.drain(process.stderr))  # type: ignore
+            reporter = asyncio.ensure_future(self._report(on_output, stdout, stderr, interval)) if on_output else None
+
+            timed_out = finished = False
+            try:
+                await asyncio.wait_for(asyncio.shield(readers), timeout)
+                await asyncio.wait_for(process.wait(), max(timeout / 10, 1.0))
+                finished = True
+            except asyncio.TimeoutError:
+                timed_out = True
+                logger.warning("Command %r exceeded its %ss deadline, killing it.", command, timeout)
+            finally:
+                if not finished:
+                    # The group outlives the shell, so background children are killed even once it exited.
+                    self._kill(process)
+                if process.returncode is None:
+                    await process.wait()
+                # Whatever was read so far is kept; nothing is left to write to the pipes.
+                readers.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await readers
+                if reporter is not None:
+                    reporter.cancel()
+                self.running -= 1
+
+        result = ShellResult(
+            stdout.text(), stderr.text(), process.returncode, timed_out, stdout.truncated or stderr.truncated
+        )
+        if on_output is not None:
+            await on_output(self.combine(result.stdout, result.stderr))
+        return result
+
+    @staticmethod
+    def _kill(process: asyncio.subprocess.Process) -> None:
+        with contextlib.suppress(ProcessLookupError):
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+
+    @staticmethod
+    def combine(stdout: str, stderr: str) -> str:
+        return "\n".join(part for part in (stdout, stderr) if part)
+
+    async def _report(self, callback: OutputCallback, stdout: _Capture, stderr: _Capture, interval: float) -> None:
+        sent: List[int] = [0, 0]
+        while True:
+            await asyncio.sleep(interval)
+            sizes = [len(stdout.buffer), len(stderr.buffer)]
+            if sizes == sent:
+                continue
+            sent = sizes
+            started = time.perf_counter()
+            try:
+                await callback(self.combine(stdout.text(), stderr.text()))
+            except Exception as exc:
+                logger.debug("Output callback failed.", exc_info=exc)
+            # Back off when the callback itself is slow, e.g. while being rate limited.
+            interval = max(interval, time.perf_counter() - started)
+
+
+shell_runner: ShellRunner = ShellRunner()
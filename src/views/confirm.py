@@ -19,85 +19,275 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+from __future__ import annotations
+
+import json
+import time
 import random
-import itertools
+import asyncio
+import logging
+import secrets
 
-from typing import TYPE_CHECKING, Coroutine, Tuple
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Set, Tuple
 
 import discord
 
 if TYPE_CHECKING:
-    from src.classes import Context
+    from redis.asyncio import Redis
 
+    from src.classes import RoboMoxie
 
-__all__ = ("ConfirmView",)
 
+__all__ = ("Buttons", "DEFAULT_BUTTONS", "ConfirmView", "Confirmation", "ConfirmationManager")
+logger = logging.getLogger(__name__)
 
-class AcceptButton(discord.ui.Button):
-    def __init__(self, label: str | None, emoji: str | None, button_style: discord.ButtonStyle) -> None:
-        super().__init__(label=label, emoji=emoji, style=button_style)
+Buttons = Tuple[
+    Tuple[Optional[str], Optional[str], discord.ButtonStyle],
+    Tuple[Optional[str], Optional[str], discord.ButtonStyle],
+]
+DEFAULT_BUTTONS: Buttons = (("✅", "Yes please!", discord.ButtonStyle.green), ("🗑️", "Nuuu!", discord.ButtonStyle.red))
+CUSTOM_ID_PREFIX: str = "moxie:confirm:"
 
-    async def callback(self, interaction: discord.Interaction) -> Coroutine:
-        view: ConfirmView = self.view
-        view.value = True
-        view.stop()
 
-        return await interaction.response.edit_message(view=view)
+class ConfirmView(discord.ui.View):
+    """The accept and decline buttons of a confirmation.
 
+    The view holds no state and is stopped before it is sent, so discord.py does
+    not keep it alive; clicks are routed by ``custom_id`` to
+    :class:`ConfirmationManager`. ``buttons`` are ``(emoji, label, style)`` pairs.
+    """
 
-class DeclineButton(discord.ui.Button):
-    def __init__(self, label: str | None, emoji: str | None, button_style: discord.ButtonStyle) -> None:
-        super().__init__(label=label, emoji=emoji, style=button_style)
+    def __init__(self, token: str, buttons: Buttons = DEFAULT_BUTTONS) -> None:
+        super().__init__(timeout=None)
+        for value, (emoji, label, style) in zip((1, 0), buttons):
+            self.add_item(
+                discord.ui.Button(emoji=emoji, label=label, style=style, custom_id=f"{CUSTOM_ID_PREFIX}{token}:{value}")
+            )
+        self.stop()
 
-    async def callback(self, interaction: discord.Interaction) -> Coroutine:
-        view: ConfirmView = self.view
-        view.value = False
-        view.stop()
 
-        return await interaction.response.edit_message(view=view)
+class Confirmation(NamedTuple):
+    """A pending confirmation, as stored in memory and in Redis."""
 
+    token: str
+    owner_id: int
+    channel_id: int
+    message_id: int
+    deadline: float
+
+    def dumps(self) -> str:
+        return json.dumps(self)
+
+    @classmethod
+    def loads(cls, data: str | bytes) -> Confirmation:
+        return cls(*json.loads(data))
+
+
+class ConfirmationManager:
+    """Routes confirmation clicks by ``custom_id`` and expires them from one timer wheel.
+
+    Pending confirmations live in a table keyed by token rather than in one
+    :class:`discord.ui.View` and timeout task each. Deadlines are bucketed into
+    ``resolution``-second slots of a single wheel, drained by one task. Every
+    confirmation is also written to Redis, so after a restart the buttons of
+    old prompts still answer (the prompt is closed, and ``on_orphaned_confirmation``
+    is dispatched with its value) and their timeouts still fire.
+
+    Examples
+    --------
+    >>> confirmation, view = bot.confirmations.create(ctx.author, timeout=30)
+    ... message = await ctx.send("Are you sure?", view=view)
+    ... value = await bot.confirmations.wait(confirmation, message)  # True, False or None
+    """
 
-class ConfirmView(discord.ui.View):
     def __init__(
-        self,
-        ctx: "Context",
-        buttons: Tuple[
-            Tuple[str | None, str | None, discord.ButtonStyle],
-            Tuple[str | None, str | None, discord.ButtonStyle],
-        ],
-        timeout: float = 60.0,
-        owner: discord.User | discord.Member | None = None,
+        self, bot: RoboMoxie, *, redis: Optional[Redis] = None, namespace: str = "moxie:confirm", resolution: float = 1.0
     ) -> None:
-        super().__init__(timeout=timeout)
-        self.message = None
-        self.value = None
-        self.ctx = ctx
-        self.owner = owner or ctx.author
-        self.add_item(
-            AcceptButton(
-                label=buttons[0][0],
-                emoji=buttons[0][1],
-                button_style=buttons[0][2],
-            )
-        )
-        self.add_item(
-            DeclineButton(
-                label=buttons[1][0],
-                emoji=buttons[1][1],
-                button_style=buttons[1][2],
+        self.bot = bot
+        self.redis = redis
+        self.namespace = namespace
+        self.resolution = resolution
+
+        self.pending: Dict[str, Confirmation] = {}
+        self._waiters: Dict[str, asyncio.Future[Optional[bool]]] = {}
+        # Resolved tokens whose Redis entry is still being deleted.
+        self._forgetting: Set[str] = set()
+        self._wheel: Dict[int, Set[str]] = {}
+        self._cursor: int = 0
+        self._runner: Optional[asyncio.Task[None]] = None
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    async def start(self) -> None:
+        """Starts routing clicks and restores the confirmations that were pending before a restart."""
+        self.bot.add_listener(self.on_interaction)
+        if self.redis is None:
+            return
+
+        restored = 0
+        try:
+            async for key in self.redis.scan_iter(match=f"{self.namespace}:*", count=500):
+                if (data := await self.redis.get(key)) is not None:
+                    self._add(Confirmation.loads(data))
+                    restored += 1
+        except Exception as exc:
+            logger.warning("Failed to restore pending confirmations.", exc_info=exc)
+        if restored:
+            logger.info("Restored %s pending confirmations.", restored)
+
+    def stop(self) -> None:
+        self.bot.remove_listener(self.on_interaction)
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+        for future in self._waiters.values():
+            future.cancel()
+        self._waiters.clear()
+
+    def create(
+        self, owner: discord.abc.Snowflake, *, timeout: float = 60.0, buttons: Buttons = DEFAULT_BUTTONS
+    ) -> Tuple[Confirmation, ConfirmView]:
+        """Returns a new pending confirmation and the view to send with it.
+
+        It is registered straight away, so a click that arrives while the prompt
+        is still being sent is kept for :meth:`wait` instead of closing the prompt.
+        """
+        token = secrets.token_hex(8)
+        confirmation = Confirmation(token, owner.id, 0, 0, time.time() + timeout)
+        self._waiters[token] = asyncio.get_running_loop().create_future()
+        self._add(confirmation)
+        return confirmation, ConfirmView(token, buttons)
+
+    async def wait(self, confirmation: Confirmation, message: discord.Message) -> Optional[bool]:
+        """Waits for the owner of ``confirmation`` to click a button, or for it to time out (``None``)."""
+        if (future := self._waiters.get(confirmation.token)) is None:
+            return None
+        if (pending := self.pending.get(confirmation.token)) is not None:
+            confirmation = self.pending[confirmation.token] = pending._replace(
+                channel_id=message.channel.id, message_id=message.id
             )
-        )
-
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        allowed_ids = list(itertools.chain([self.owner.id], [self.ctx.bot.owner_ids]))
-        if interaction.user.id in allowed_ids:
-            return True
-
-        messages = [
-            "Sowwy, **%s**! This component doesn't belong to you." % interaction.user,
-            "Please don't touch other people's buttons, **%s**." % interaction.user,
-            "You can't touch this, **%s**." % interaction.user,
-            "Please stop touching other people's buttons, **%s**." % interaction.user,
-        ]
-        await interaction.response.send_message(random.choice(messages), ephemeral=True)
-        return False
+            await self._persist(confirmation)
+        try:
+            return await future
+        finally:
+            self._waiters.pop(confirmation.token, None)
+
+    def _add(self, confirmation: Confirmation) -> None:
+        self.pending[confirmation.token] = confirmation
+        tick = self._tick(confirmation.deadline)
+        self._wheel.setdefault(tick, set()).add(confirmation.token)
+        if self._runner is None:
+            self._cursor = self._tick(time.time())
+            self._runner = asyncio.create_task(self._run())
+        # Restored confirmations may already be overdue.
+        self._cursor = min(self._cursor, tick)
+
+    def _tick(self, timestamp: float) -> int:
+        return int(timestamp // self.resolution)
+
+    def _resolve(self, token: str, value: Optional[bool]) -> Optional[Confirmation]:
+        if (confirmation := self.pending.pop(token, None)) is None:
+            return None
+        tick = self._tick(confirmation.deadline)
+        if (bucket := self._wheel.get(tick)) is not None:
+            bucket.discard(token)
+            if not bucket:
+                del self._wheel[tick]
+
+        if (future := self._waiters.get(token)) is not None and not future.done():
+            future.set_result(value)
+        if self.redis is not None:
+            self._forgetting.add(token)
+            self.bot.loop.create_task(self._forget(token))
+        return confirmation
+
+    async def _run(self) -> None:
+        try:
+            while self.pending:
+                await asyncio.sleep(max((self._cursor + 1) * self.resolution - time.time(), 0))
+                # A slot is only drained once it has fully passed, so nothing expires early.
+                now = self._tick(time.time())
+                for tick in range(self._cursor, now):
+                    for token in self._wheel.pop(tick, ()):
+                        confirmation = self._resolve(token, None)
+                        if confirmation is None:
+                            continue
+                        if confirmation.token not in self._waiters:
+                            await self._close_orphan(confirmation, "This confirmation timed out.")
+                        elif not confirmation.message_id:
+                            # It timed out before it was sent, so nothing will wait for it.
+                            self._waiters.pop(confirmation.token)
+                self._cursor = max(self._cursor, now)
+        finally:
+            self._runner = None
+
+    async def on_interaction(self, interaction: discord.Interaction) -> None:
+        custom_id = (interaction.data or {}).get("custom_id", "")
+        if interaction.type is not discord.InteractionType.component or not custom_id.startswith(CUSTOM_ID_PREFIX):
+            return
+
+        token, _, value = custom_id[len(CUSTOM_ID_PREFIX) :].partition(":")
+        if (confirmation := self.pending.get(token) or await self._recover(token)) is None:
+            # Neither pending here nor in Redis, so it was answered or timed out, possibly before a restart.
+            await interaction.response.edit_message(content="This confirmation has expired.", view=None)
+            return
+
+        if interaction.user.id != confirmation.owner_id and interaction.user.id not in self.bot.owner_ids:
+            messages = [
+                "Sowwy, **%s**! This component doesn't belong to you." % interaction.user,
+                "Please don't touch other people's buttons, **%s**." % interaction.user,
+                "You can't touch this, **%s**." % interaction.user,
+                "Please stop touching other people's buttons, **%s**." % interaction.user,
+            ]
+            await interaction.response.send_message(random.choice(messages), ephemeral=True)
+            return
+
+        orphaned = token not in self._waiters
+        self._resolve(token, value == "1")
+        if orphaned:
+            # Nobody is waiting on it any more; the prompt was sent before a restart.
+            self.bot.dispatch("orphaned_confirmation", confirmation, value == "1")
+            await interaction.response.edit_message(content="This confirmation has expired.", view=None)
+        else:
+            await interaction.response.defer()
+
+    async def _close_orphan(self, confirmation: Confirmation, content: str) -> None:
+        channel = self.bot.get_partial_messageable(confirmation.channel_id)
+        try:
+            await channel.get_partial_message(confirmation.message_id).edit(content=content, view=None)
+        except discord.HTTPException as exc:
+            logger.debug("Failed to close confirmation %s.", confirmation.token, exc_info=exc)
+
+    async def _persist(self, confirmation: Confirmation) -> None:
+        if self.redis is None:
+            return
+        milliseconds = max(int((confirmation.deadline - time.time()) * 1000), 1)
+        try:
+            await self.redis.set(f"{self.namespace}:{confirmation.token}", confirmation.dumps(), px=milliseconds)
+        except Exception as exc:
+            logger.warning("Failed to persist confirmation %s.", confirmation.token, exc_info=exc)
+
+    async def _recover(self, token: str) -> Optional[Confirmation]:
+        """Loads a confirmation from before a restart that :meth:`start` has not restored yet."""
+        if self.redis is None or token in self._forgetting:
+            return None
+        try:
+            data = await self.redis.get(f"{self.namespace}:{token}")
+        except Exception as exc:
+            logger.debug("Failed to look up confirmation %s.", token, exc_info=exc)
+            return None
+        if data is None or token in self.pending or token in self._forgetting:
+            return self.pending.get(token)
+
+        confirmation = Confirmation.loads(data)
+        self._add(confirmation)
+        return confirmation
+
+    async def _forget(self, token: str) -> None:
+        try:
+            await self.redis.delete(f"{self.namespace}:{token}")  # type: ignore
+        except Exception as exc:
+            logger.debug("Failed to forget confirmation %s.", token, exc_info=exc)
+        finally:
+            self._forgetting.discard(token)
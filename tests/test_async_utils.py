@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+Copyright (c) 2022-Present Lia Marie
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from typing import Any, List
+
+from src.utils import AsyncCache
+
+
+class Member:
+    def __init__(self, user_id: int) -> None:
+        self.id = user_id
+
+    def __str__(self) -> str:
+        return "moxie"
+
+
+def counting_cache() -> tuple[Any, List[Any]]:
+    calls: List[Any] = []
+
+    async def fetch(*args: Any, **kwargs: Any) -> int:
+        calls.append((args, kwargs))
+        return len(calls)
+
+    return AsyncCache(16)(fetch), calls
+
+
+def test_equal_arguments_hit() -> None:
+    fetch, calls = counting_cache()
+
+    async def run() -> None:
+        assert await fetch(1, guild="moxie") == await fetch(1, guild="moxie")
+        assert await fetch([1, 2]) == await fetch([1, 2])
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_distinct_arguments_miss() -> None:
+    fetch, calls = counting_cache()
+
+    async def run() -> None:
+        await fetch(1)
+        await fetch("1")
+        await fetch(1, guild="moxie")
+        await fetch([1])
+        await fetch((1,))
+
+    asyncio.run(run())
+    assert len(calls) == 5
+
+
+def test_objects_that_print_alike_miss() -> None:
+    fetch, calls = counting_cache()
+    first, second = Member(1), Member(1)
+
+    async def run() -> None:
+        await fetch(first)
+        await fetch(first)
+        await fetch(second)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_use_cache_false_refreshes_the_entry() -> None:
+    fetch, calls = counting_cache()
+
+    async def run() -> None:
+        assert await fetch(1) == 1
+        assert await fetch(1, use_cache=False) == 2
+        assert await fetch(1) == 2
+
+    asyncio.run(run())
+    assert len(calls) == 2